@@ -7,6 +7,7 @@ from typing import Dict, List, Optional, Tuple, Union
 
 from wireviz.wv_colors import COLOR_CODES, Color, ColorMode, Colors, ColorScheme
 from wireviz.wv_helper import aspect_ratio, int2tuple
+from wireviz.wv_layout import LAYOUT_ENGINES, LAYOUT_PROFILES, NATIVE_ENGINE
 
 # Each type alias have their legal values described in comments - validation might be implemented in the future
 PlainText = str  # Text not containing HTML tags nor newlines
@@ -58,8 +59,25 @@ class Options:
     color_mode: ColorMode = "SHORT"
     mini_bom_mode: bool = True
     template_separator: str = "."
+    pack_components: bool = False
+    layout_profile: str = "quality"  # = Literal[*LAYOUT_PROFILES]
+    layout_engine: str = "dot"  # = Literal[*LAYOUT_ENGINES, NATIVE_ENGINE]
+    layout_timeout: Optional[float] = None  # seconds
+    layout_memory_limit: Optional[int] = None  # MB
+    layout_statistics: bool = False
+    preview: bool = False
 
     def __post_init__(self):
+        if self.layout_profile not in LAYOUT_PROFILES:
+            raise Exception(
+                f"Unknown layout profile '{self.layout_profile}', expected one of: "
+                + ", ".join(LAYOUT_PROFILES)
+            )
+        if self.layout_engine not in (*LAYOUT_ENGINES, NATIVE_ENGINE):
+            raise Exception(
+                f"Unknown layout engine '{self.layout_engine}', expected one of: "
+                + ", ".join((*LAYOUT_ENGINES, NATIVE_ENGINE))
+            )
         if not self.bgcolor_node:
             self.bgcolor_node = self.bgcolor
         if not self.bgcolor_connector:
@@ -216,9 +234,11 @@ class Connector:
                 # Make sure loop connected pins are not hidden.
                 self.activate_pin(pin, None)
 
-        for i, item in enumerate(self.additional_components):
-            if isinstance(item, dict):
-                self.additional_components[i] = AdditionalComponent(**item)
+        # create a new list to leave the input data untouched
+        self.additional_components = [
+            AdditionalComponent(**item) if isinstance(item, dict) else item
+            for item in self.additional_components
+        ]
 
     def activate_pin(self, pin: Pin, side: Side) -> None:
         self.visible_pins[pin] = True
@@ -370,9 +390,11 @@ class Cable:
             # by default, show wire numbers for cables, hide for bundles
             self.show_wirenumbers = self.category != "bundle"
 
-        for i, item in enumerate(self.additional_components):
-            if isinstance(item, dict):
-                self.additional_components[i] = AdditionalComponent(**item)
+        # create a new list to leave the input data untouched
+        self.additional_components = [
+            AdditionalComponent(**item) if isinstance(item, dict) else item
+            for item in self.additional_components
+        ]
 
     # The *_pin arguments accept a tuple, but it seems not in use with the current code.
     def connect(
@@ -1,13 +1,13 @@
 # -*- coding: utf-8 -*-
 
+import json
 import re
 from collections import Counter
 from dataclasses import dataclass
 from itertools import zip_longest
 from pathlib import Path
-from typing import Any, List, Union
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
-from graphviz import Graph
 from wireviz import APP_NAME, APP_URL, __version__, wv_colors
 from wireviz.DataClasses import (
     Cable,
@@ -43,13 +43,26 @@ from wireviz.wv_gv_html import (
 )
 from wireviz.wv_helper import (
     awg_equiv,
-    file_write_text,
+    file_replace_if_changed,
+    file_write_bytes_if_changed,
+    file_write_text_if_changed,
     flatten2d,
     is_arrow,
     mm2_equiv,
     tuplelist2tsv,
 )
-from wireviz.wv_html import generate_html_output
+from wireviz.wv_layout import (
+    LAYOUT_FALLBACKS,
+    LAYOUT_PROFILES,
+    NATIVE_ENGINE,
+    LayoutLimitExceeded,
+    can_pack,
+    pipe_formats,
+    pipe_formats_async,
+    pipe_packed,
+    pipe_packed_async,
+)
+from wireviz.wv_timing import measuring_time, record_span, span
 
 OLD_CONNECTOR_ATTR = {
     "pinout": "was renamed to 'pinlabels' in v0.2",
@@ -76,25 +89,52 @@ class Harness:
         self.cables = {}
         self.mates = []
         self._bom = []  # Internal Cache for generated bom
+        self._adjacency = None  # Internal Cache for adjacency index
+        self._graph = None  # Internal Cache for GraphViz Graph object
+        self._rendered = {}  # Internal Cache for GraphViz output per format
+        self._svg = None  # Internal Cache for SVG output with embedded images
+        # seconds per GraphViz layout step of the last layout, if collected
+        self.layout_statistics = {}
         self.additional_bom_items = []
+        self.focus = None  # Designators to limit the diagram to, or None for all
+
+    def invalidate_cache(self, graph_only: bool = False) -> None:
+        """
+        Drop cached results. Called automatically when adding components and connections,
+        but must be called after changing options or tweak of an existing harness.
+        The metadata is only read when writing the HTML and graph JSON outputs,
+        so it can be replaced without dropping the cached diagram and BOM.
+        """
+        self._graph = None
+        self._rendered = {}
+        self._svg = None
+        self.layout_statistics = {}
+        if not graph_only:
+            self._bom = []
+            self._adjacency = None
 
     def add_connector(self, name: str, *args, **kwargs) -> None:
         check_old(f"Connector '{name}'", OLD_CONNECTOR_ATTR, kwargs)
         self.connectors[name] = Connector(name, *args, **kwargs)
+        self.invalidate_cache()
 
     def add_cable(self, name: str, *args, **kwargs) -> None:
         self.cables[name] = Cable(name, *args, **kwargs)
+        self.invalidate_cache()
 
     def add_mate_pin(self, from_name, from_pin, to_name, to_pin, arrow_type) -> None:
         self.mates.append(MatePin(from_name, from_pin, to_name, to_pin, arrow_type))
         self.connectors[from_name].activate_pin(from_pin, Side.RIGHT)
         self.connectors[to_name].activate_pin(to_pin, Side.LEFT)
+        self.invalidate_cache()
 
     def add_mate_component(self, from_name, to_name, arrow_type) -> None:
         self.mates.append(MateComponent(from_name, to_name, arrow_type))
+        self.invalidate_cache()
 
     def add_bom_item(self, item: dict) -> None:
         self.additional_bom_items.append(item)
+        self.invalidate_cache()
 
     def connect(
         self,
@@ -156,13 +196,129 @@ class Harness:
 
         # perform the actual connection
         self.cables[via_name].connect(from_name, from_pin, via_wire, to_name, to_pin)
+        self.invalidate_cache()
         if from_name in self.connectors:
             self.connectors[from_name].activate_pin(from_pin, Side.RIGHT)
         if to_name in self.connectors:
             self.connectors[to_name].activate_pin(to_pin, Side.LEFT)
 
-    def create_graph(self) -> Graph:
-        dot = Graph()
+    def adjacency(self) -> Dict[str, Set[str]]:
+        """Return a mapping from each connector and cable designator to the designators it is joined to."""
+        if self._adjacency is None:
+            self._adjacency = self._create_adjacency()
+        return self._adjacency  # cached, do not modify
+
+    def _create_adjacency(self) -> Dict[str, Set[str]]:
+        adjacency = {name: set() for name in [*self.connectors, *self.cables]}
+
+        def join(a: Optional[str], b: Optional[str]) -> None:
+            if a is not None and b is not None:
+                adjacency[a].add(b)
+                adjacency[b].add(a)
+
+        for cable in self.cables.values():
+            for connection in cable.connections:
+                join(connection.from_name, cable.name)
+                join(cable.name, connection.to_name)
+        for mate in self.mates:
+            join(mate.from_name, mate.to_name)
+        return adjacency
+
+    def connected_components(
+        self, designators: Optional[Iterable[str]] = None
+    ) -> List[List[str]]:
+        """
+        Return the designators of each electrically independent part of the harness,
+        optionally only considering the given connector and cable designators.
+        """
+        adjacency = self.adjacency()
+        if designators is not None:
+            designators = set(designators)
+        components = []
+        visited = set()
+        for start in adjacency:  # connectors first, then cables, in order of creation
+            if start in visited or (
+                designators is not None and start not in designators
+            ):
+                continue
+            visited.add(start)
+            component = []
+            stack = [start]
+            while stack:
+                name = stack.pop()
+                component.append(name)
+                for neighbor in adjacency[name] - visited:
+                    if designators is None or neighbor in designators:
+                        visited.add(neighbor)
+                        stack.append(neighbor)
+            components.append(component)
+        return components
+
+    def neighborhood(self, designators: Iterable[str], depth: int) -> Set[str]:
+        """
+        Return the given connector and cable designators together with all designators
+        within depth hops from them, where each hop goes from a connector to an attached
+        cable or mated connector, or from a cable to an attached connector.
+        """
+        adjacency = self.adjacency()
+        for designator in designators:
+            if designator not in adjacency:
+                raise Exception(f"{designator} is not a connector or cable designator")
+        found = set(designators)
+        frontier = set(found)
+        for _ in range(depth):
+            frontier = {n for name in frontier for n in adjacency[name]} - found
+            found |= frontier
+        return found
+
+    def set_focus(self, designators: Optional[Iterable[str]], depth: int = 2) -> None:
+        """
+        Limit the diagram to the neighborhood of the given designators (see neighborhood()),
+        or show the whole harness again if designators is None. The BOM is not affected.
+        """
+        self.focus = (
+            None if designators is None else self.neighborhood(designators, depth)
+        )
+        self.invalidate_cache(graph_only=True)
+
+    def create_graph(
+        self,
+        designators: Optional[Iterable[str]] = None,
+        simple_connectors: bool = False,
+    ) -> "graphviz.Graph":
+        """
+        Return the diagram, optionally limited to the given connector and cable designators,
+        and optionally drawing all connectors as if they had style: simple.
+        """
+        if designators is not None:
+            designators = set(designators)
+        if self.focus is not None:
+            designators = (
+                self.focus if designators is None else designators & self.focus
+            )
+        connectors = [
+            connector
+            for connector in self.connectors.values()
+            if designators is None or connector.name in designators
+        ]
+        cables = [
+            cable
+            for cable in self.cables.values()
+            if designators is None or cable.name in designators
+        ]
+        mates = [
+            mate
+            for mate in self.mates
+            if designators is None
+            or (mate.from_name in designators and mate.to_name in designators)
+        ]
+
+        def is_simple(connector: Connector) -> bool:
+            return simple_connectors or connector.style == "simple"
+
+        from graphviz import Graph  # deferred, not needed until a graph is created
+
+        dot = Graph(engine=self._graphviz_engine())
         dot.body.append(f"// Graph generated by {APP_NAME} {__version__}\n")
         dot.body.append(f"// {APP_URL}\n")
         dot.attr(
@@ -172,6 +328,7 @@ class Harness:
             bgcolor=wv_colors.translate_color(self.options.bgcolor, "HEX"),
             nodesep="0.33",
             fontname=self.options.fontname,
+            **LAYOUT_PROFILES[self.options.layout_profile],
         )  # TODO: Add graph attribute: charset="utf-8",
         dot.attr(
             "node",
@@ -185,7 +342,30 @@ class Harness:
         )
         dot.attr("edge", style="bold", fontname=self.options.fontname)
 
-        for connector in self.connectors.values():
+        if self.options.preview:
+            # low-fidelity diagram: only node names and one edge per joined pair
+            for component in [*connectors, *cables]:
+                # like simple connectors, show the type instead of a hidden name
+                label = component.name if component.show_name else component.type
+                dot.node(component.name, label=remove_links(label or ""), shape="box")
+            edges = {}  # ordered set of edges
+            for cable in cables:
+                for connection in cable.connections:
+                    if connection.from_name is not None and (
+                        designators is None or connection.from_name in designators
+                    ):
+                        edges[(connection.from_name, cable.name, "bold")] = None
+                    if connection.to_name is not None and (
+                        designators is None or connection.to_name in designators
+                    ):
+                        edges[(cable.name, connection.to_name, "bold")] = None
+            for mate in mates:
+                edges[(mate.from_name, mate.to_name, "dashed")] = None
+            for from_name, to_name, style in edges:
+                dot.edge(f"{from_name}:e", f"{to_name}:w", style=style)
+            return dot
+
+        for connector in connectors:
             # If no wires connected (except maybe loop wires)?
             if not (connector.ports_left or connector.ports_right):
                 connector.ports_left = True  # Use left side pins.
@@ -202,7 +382,7 @@ class Harness:
                      f'{connector.pincount}-pin' if connector.show_pincount else None,
                      translate_color(connector.color, self.options.color_mode) if connector.color else None,
                      html_colorbar(connector.color)],
-                    '<!-- connector table -->' if connector.style != 'simple' else None,
+                    '<!-- connector table -->' if not is_simple(connector) else None,
                     [html_image(connector.image)],
                     [html_caption(connector.image)]]
             # fmt: on
@@ -211,7 +391,7 @@ class Harness:
             rows.append([html_line_breaks(connector.notes)])
             html.extend(nested_html_table(rows, html_bgcolor_attr(connector.bgcolor)))
 
-            if connector.style != "simple":
+            if not is_simple(connector):
                 pinhtml = []
                 pinhtml.append(
                     '<table border="0" cellspacing="0" cellpadding="3" cellborder="1">'
@@ -269,7 +449,7 @@ class Harness:
                 fillcolor=translate_color(self.options.bgcolor_connector, "HEX"),
             )
 
-            if len(connector.loops) > 0:
+            if len(connector.loops) > 0 and not is_simple(connector):
                 dot.attr("edge", color="#000000:#ffffff:#000000")
                 if connector.ports_left:
                     loop_side = "l"
@@ -294,7 +474,7 @@ class Harness:
             for colorstr in cable.colors
         )
 
-        for cable in self.cables.values():
+        for cable in cables:
             html = []
 
             awg_fmt = ""
@@ -473,12 +653,13 @@ class Harness:
                     from_pin_index = from_connector.pins.index(connection.from_pin)
                     from_port_str = (
                         f":p{from_pin_index+1}r"
-                        if from_connector.style != "simple"
+                        if not is_simple(from_connector)
                         else ""
                     )
                     code_left_1 = f"{connection.from_name}{from_port_str}:e"
                     code_left_2 = f"{cable.name}:w{connection.via_port}:w"
-                    dot.edge(code_left_1, code_left_2)
+                    if designators is None or connection.from_name in designators:
+                        dot.edge(code_left_1, code_left_2)
                     if from_connector.show_name:
                         from_info = [
                             str(connection.from_name),
@@ -499,11 +680,12 @@ class Harness:
                     to_connector = self.connectors[connection.to_name]
                     to_pin_index = to_connector.pins.index(connection.to_pin)
                     to_port_str = (
-                        f":p{to_pin_index+1}l" if to_connector.style != "simple" else ""
+                        f":p{to_pin_index+1}l" if not is_simple(to_connector) else ""
                     )
                     code_right_1 = f"{cable.name}:w{connection.via_port}:e"
                     code_right_2 = f"{connection.to_name}{to_port_str}:w"
-                    dot.edge(code_right_1, code_right_2)
+                    if designators is None or connection.to_name in designators:
+                        dot.edge(code_right_1, code_right_2)
                     if to_connector.show_name:
                         to_info = [str(connection.to_name), str(connection.to_pin)]
                         if to_connector.pinlabels:
@@ -533,7 +715,7 @@ class Harness:
             )
 
         # mates
-        for mate in self.mates:
+        for mate in mates:
             if mate.shape[-1] == ">":
                 dir = "both" if mate.shape[0] == "<" else "forward"
             else:
@@ -548,12 +730,12 @@ class Harness:
 
             from_connector = self.connectors[mate.from_name]
             to_connector = self.connectors[mate.to_name]
-            if isinstance(mate, MatePin) and from_connector.style != "simple":
+            if isinstance(mate, MatePin) and not is_simple(from_connector):
                 from_pin_index = from_connector.pins.index(mate.from_pin)
                 from_port_str = f":p{from_pin_index+1}r"
             else:  # MateComponent or style == 'simple'
                 from_port_str = ""
-            if isinstance(mate, MatePin) and to_connector.style != "simple":
+            if isinstance(mate, MatePin) and not is_simple(to_connector):
                 to_pin_index = to_connector.pins.index(mate.to_pin)
                 to_port_str = f":p{to_pin_index+1}l"
             else:  # MateComponent or style == 'simple'
@@ -635,30 +817,195 @@ class Harness:
 
         return dot
 
-    # cache for the GraphViz Graph object
-    # do not access directly, use self.graph instead
-    _graph = None
-
     @property
     def graph(self):
         if not self._graph:  # no cached graph exists, generate one
-            self._graph = self.create_graph()
+            with span("graph"):
+                self._graph = self.create_graph()
         return self._graph  # return cached graph
 
+    def _layout_sources(
+        self,
+        graph_attrs: Optional[Dict[str, str]] = None,
+        simple_connectors: bool = False,
+    ) -> List[str]:
+        """Return the graph source, or one source per component if they are to be packed."""
+
+        def source(designators: Optional[List[str]] = None) -> str:
+            if not graph_attrs and not simple_connectors and designators is None:
+                return self.graph.source
+            graph = self.create_graph(designators, simple_connectors)
+            if graph_attrs:
+                graph.attr("graph", **graph_attrs)  # overrides earlier graph attributes
+            return graph.source
+
+        if self.options.pack_components and not self.tweak.append:
+            # tweak.append may reference anything, so it requires a single layout
+            components = self.connected_components(self.focus)
+            if len(components) > 1:
+                if can_pack():
+                    return [source(c) for c in components]
+                print(
+                    "Warning: gvpack or neato not found, laying out all components together"
+                )
+        return [source()]
+
+    def _layout_limits(self) -> Dict[str, Any]:
+        return {
+            "timeout": self.options.layout_timeout,
+            "memory_limit": self.options.layout_memory_limit,
+        }
+
+    def _collect_statistics(self) -> bool:
+        return self.options.layout_statistics or measuring_time()
+
+    def _keep_statistics(self, statistics: Optional[Dict[str, float]]) -> None:
+        """Keep the GraphViz layout step durations, and report them as nested spans."""
+        if statistics is not None:
+            self.layout_statistics = statistics
+            for step, seconds in statistics.items():
+                record_span(step, seconds)
+
+    def _graphviz_engine(self) -> str:
+        engine = self.options.layout_engine
+        return "dot" if engine == NATIVE_ENGINE else engine
+
+    def _native_render(self, formats: List[str]) -> Optional[Dict[str, bytes]]:
+        """Return the diagram laid out without GraphViz, if configured and possible."""
+        if self.options.layout_engine != NATIVE_ENGINE:
+            return None
+        from wireviz.wv_native_layout import native_layout_problem, render_native_svg
+
+        if formats != ["svg"]:
+            problem = "only SVG output is supported"
+        else:
+            problem = native_layout_problem(self)
+        if problem:
+            print(f"Warning: Native layout not possible ({problem}), using dot")
+            return None
+        with span("layout"):
+            return {"svg": render_native_svg(self)}
+
+    def _layout_attempts(
+        self, errors: List[LayoutLimitExceeded]
+    ) -> Iterator[Tuple[List[str], str, Optional[Dict[str, float]]]]:
+        """
+        Yield (GraphViz sources, engine, statistics) of the layout as configured,
+        then of each cheaper layout to retry with after the caller appended
+        the LayoutLimitExceeded error of the previous attempt to errors.
+        Raise the last error if no attempt is left.
+        """
+        for description, *config in [(None, None, False), *LAYOUT_FALLBACKS]:
+            if errors:
+                print(f"Warning: {errors[-1]}, retrying with {description}")
+            with span("gv source"):
+                sources = self._layout_sources(*config)
+            statistics = {} if self._collect_statistics() else None
+            yield sources, self._graphviz_engine(), statistics
+        raise errors[-1]
+
+    def _pipe(self, formats: List[str]) -> Dict[str, bytes]:
+        """
+        Return the diagram laid out once by GraphViz and rendered in each format,
+        retrying with cheaper layouts if the configured limits are exceeded.
+        """
+        native = self._native_render(formats)
+        if native is not None:
+            return native
+        errors = []
+        for sources, engine, statistics in self._layout_attempts(errors):
+            options = dict(statistics=statistics, **self._layout_limits())
+            try:
+                with span("layout"):
+                    if len(sources) > 1:
+                        rendered = pipe_packed(sources, formats, engine, **options)
+                    else:
+                        rendered = pipe_formats(sources[0], formats, engine, **options)
+                    self._keep_statistics(statistics)
+                return rendered
+            except LayoutLimitExceeded as error:
+                errors.append(error)
+
+    async def _pipe_async(self, formats: List[str]) -> Dict[str, bytes]:
+        """Same as _pipe(), but running GraphViz without blocking the event loop."""
+        native = self._native_render(formats)
+        if native is not None:
+            return native
+        errors = []
+        for sources, engine, statistics in self._layout_attempts(errors):
+            options = dict(statistics=statistics, **self._layout_limits())
+            try:
+                with span("layout"):
+                    if len(sources) > 1:
+                        rendered = await pipe_packed_async(
+                            sources, formats, engine, **options
+                        )
+                    else:
+                        rendered = await pipe_formats_async(
+                            sources[0], formats, engine, **options
+                        )
+                    self._keep_statistics(statistics)
+                return rendered
+            except LayoutLimitExceeded as error:
+                errors.append(error)
+
+    def render(self, formats: Union[str, Iterable[str]] = "svg") -> Dict[str, bytes]:
+        """
+        Return the diagram as rendered by GraphViz in each of the given formats.
+        Formats not rendered before are laid out together in a single GraphViz run,
+        and the results are cached until the harness changes (see invalidate_cache()).
+        Unlike the svg property, any images are not embedded into the SVG output.
+        """
+        formats = [formats] if isinstance(formats, str) else list(formats)
+        missing = [f for f in formats if f not in self._rendered]
+        if missing:
+            self._rendered.update(self._pipe(missing))
+        return {f: self._rendered[f] for f in formats}
+
+    async def render_async(
+        self, formats: Union[str, Iterable[str]] = "svg"
+    ) -> Dict[str, bytes]:
+        """
+        Same as render(), but without blocking the event loop while GraphViz is running.
+        The number of concurrent GraphViz processes is limited by
+        wv_layout.set_async_concurrency().
+        """
+        formats = [formats] if isinstance(formats, str) else list(formats)
+        missing = [f for f in formats if f not in self._rendered]
+        if missing:
+            self._rendered.update(await self._pipe_async(missing))
+        return {f: self._rendered[f] for f in formats}
+
+    def _embedded_svg(self) -> str:
+        if self._svg is None:
+            with span("embed images"):
+                self._svg = embed_svg_images(
+                    self._rendered["svg"].decode("utf-8"), Path.cwd()
+                )
+        return self._svg
+
     @property
     def png(self):
-        from io import BytesIO
-
-        graph = self.graph
-        data = BytesIO()
-        data.write(graph.pipe(format="png"))
-        data.seek(0)
-        return data.read()
+        return self.render("png")["png"]
 
     @property
     def svg(self):  # TODO?: Verify xml encoding="utf-8" in SVG?
-        graph = self.graph
-        return embed_svg_images(graph.pipe(format="svg").decode("utf-8"), Path.cwd())
+        self.render("svg")
+        return self._embedded_svg()
+
+    @staticmethod
+    def _graphical_formats(fmt: tuple) -> List[str]:
+        """Return the GraphViz output formats needed to generate the output formats."""
+        formats = []
+        for f in fmt:
+            if f in ("png", "svg", "html", "json", "xdot", "geometry"):
+                if f == "html":  # if HTML format is specified,
+                    f = "svg"  # generate SVG for embedding into HTML
+                if f == "geometry":  # positions are read from the layout as JSON
+                    f = "json"
+                if f not in formats:
+                    formats.append(f)
+        return formats
 
     def output(
         self,
@@ -667,37 +1014,76 @@ class Harness:
         cleanup: bool = True,
         fmt: tuple = ("html", "png", "svg", "tsv"),
     ) -> None:
+        """
+        Write the output files of the given formats, named filename (without extension)
+        plus the extension of each format. If view is True, the written diagram files
+        are opened in the default viewer. Unless cleanup is True, the GraphViz source
+        the diagram was rendered from is kept as filename.gv, as with the gv format.
+        """
+        rendered = self.render(self._graphical_formats(fmt))
+        if not cleanup and "gv" not in fmt:
+            fmt = (*fmt, "gv")
+        self._write_output(filename, fmt, rendered, view)
+
+    async def output_async(
+        self,
+        filename: (str, Path),
+        fmt: tuple = ("html", "png", "svg", "tsv"),
+    ) -> None:
+        """Same as output(), but running GraphViz without blocking the event loop."""
+        rendered = await self.render_async(self._graphical_formats(fmt))
+        self._write_output(filename, fmt, rendered)
+
+    def _write_output(
+        self,
+        filename: (str, Path),
+        fmt: tuple,
+        rendered: Dict[str, bytes],
+        view: bool = False,
+    ) -> None:
+        Path(filename).parent.mkdir(parents=True, exist_ok=True)
         # graphical output
-        graph = self.graph
-        svg_already_exists = Path(
-            f"{filename}.svg"
-        ).exists()  # if SVG already exists, do not delete later
-        # graphical output
-        for f in fmt:
-            if f in ("png", "svg", "html"):
-                if f == "html":  # if HTML format is specified,
-                    f = "svg"  # generate SVG for embedding into HTML
-                # SVG file will be renamed/deleted later
-                _filename = f"{filename}.tmp" if f == "svg" else filename
-                # TODO: prevent rendering SVG twice when both SVG and HTML are specified
-                graph.format = f
-                graph.render(filename=_filename, view=view, cleanup=cleanup)
+        for f, data in rendered.items():
+            # SVG file will be renamed/deleted later
+            if f == "svg":
+                Path(f"{filename}.tmp.svg").write_bytes(data)
+            elif f in fmt:  # not e.g. JSON only needed for the geometry
+                file_write_bytes_if_changed(f"{filename}.{f}", data)
         # embed images into SVG output
         if "svg" in fmt or "html" in fmt:
-            embed_svg_images_file(f"{filename}.tmp.svg")
+            with span("embed images"):
+                embed_svg_images_file(f"{filename}.tmp.svg")
         # GraphViz output
         if "gv" in fmt:
-            graph.save(filename=f"{filename}.gv")
+            file_write_text_if_changed(f"{filename}.gv", self.graph.source)
+        # geometry of the laid out diagram, from the same layout as the other formats
+        if "geometry" in fmt:
+            file_write_text_if_changed(
+                f"{filename}.geometry.json",
+                json.dumps(self._geometry(rendered["json"]), indent=2) + "\n",
+            )
+        # graph JSON output, streamed to keep memory low for large harnesses
+        if "graphjson" in fmt:
+            with span("graph json"):
+                from wireviz.wv_graph_json import graph_json_chunks
+
+                temp = f"{filename}.tmp.graph.json"
+                with open(temp, "w", encoding="utf-8") as file:
+                    file.writelines(graph_json_chunks(self))
+                file_replace_if_changed(temp, f"{filename}.graph.json")
         # BOM output
         bomlist = bom_list(self.bom())
         if "tsv" in fmt:
-            file_write_text(f"{filename}.bom.tsv", tuplelist2tsv(bomlist))
+            file_write_text_if_changed(f"{filename}.bom.tsv", tuplelist2tsv(bomlist))
         if "csv" in fmt:
             # TODO: implement CSV output (preferrably using CSV library)
             print("CSV output is not yet supported")
         # HTML output
         if "html" in fmt:
-            generate_html_output(filename, bomlist, self.metadata, self.options)
+            with span("html"):
+                from wireviz.wv_html import generate_html_output
+
+                generate_html_output(filename, bomlist, self.metadata, self.options)
         # PDF output
         if "pdf" in fmt:
             # TODO: implement PDF output
@@ -707,9 +1093,56 @@ class Harness:
             # SVG file was just needed to generate HTML
             Path(f"{filename}.tmp.svg").unlink()
         elif "svg" in fmt:
-            Path(f"{filename}.tmp.svg").replace(f"{filename}.svg")
+            file_replace_if_changed(f"{filename}.tmp.svg", f"{filename}.svg")
+        # open the diagrams once all files are written, not the temporary SVG file
+        if view:
+            import graphviz
+
+            for f in ("html", "png", "svg"):
+                if f in fmt:
+                    graphviz.view(f"{filename}.{f}")
+
+    def input_files(
+        self, filename: (str, Path), fmt: tuple = ("html", "png", "svg", "tsv")
+    ) -> List[Path]:
+        """
+        Return the files read to generate the given output formats for filename
+        (without extension): the images and, for HTML output, the HTML template.
+        """
+        files = [
+            Path(component.image.src)
+            for component in [*self.connectors.values(), *self.cables.values()]
+            if component.image
+        ]
+        if "html" in fmt:
+            from wireviz.wv_html import html_template_file
+
+            files.append(html_template_file(filename, self.metadata))
+        return list(dict.fromkeys(files))  # remove duplicates, keep order
+
+    def geometry(self) -> Dict[str, Any]:
+        """
+        Return the positions of connectors, cables, pins and wires in the diagram
+        (see wv_geometry.layout_geometry()), reusing a cached json layout if rendered.
+        """
+        return self._geometry(self.render("json")["json"])
+
+    def _geometry(self, layout: bytes) -> Dict[str, Any]:
+        from wireviz.wv_geometry import layout_geometry
+
+        return layout_geometry(self, layout)
+
+    def graph_json(self) -> str:
+        """
+        Return the connectors and cables as JSON nodes with ports, and the wires and
+        mates as JSON edges, without running GraphViz (see wv_graph_json for the format).
+        """
+        from wireviz.wv_graph_json import graph_json_chunks
+
+        return "".join(graph_json_chunks(self))
 
     def bom(self):
         if not self._bom:
-            self._bom = generate_bom(self)
+            with span("bom"):
+                self._bom = generate_bom(self)
         return self._bom
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import platform
+import shutil
+import statistics
+import sys
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+script_path = Path(__file__).absolute()
+
+sys.path.insert(0, str(script_path.parent.parent))  # to find wireviz module
+
+from wireviz import APP_NAME, __version__, wireviz
+from wireviz.wv_bom import bom_list, generate_bom
+from wireviz.wv_html import generate_html_output
+from wireviz.wv_layout import LAYOUT_PROFILES
+from wireviz.wv_native_layout import native_layout_problem
+from wireviz.wv_synthetic import synthetic_harness
+
+dir = script_path.parent.parent.parent
+corpora = {
+    "examples": {"path": dir / "examples", "patterns": ["demo*.yml", "ex*.yml"]},
+    "tutorial": {"path": dir / "tutorial", "patterns": ["tutorial*.yml"]},
+    "synthetic": {"sizes": [10, 100, 1000]},  # number of connectors
+}
+# options of wv_synthetic.synthetic_harness(), besides the number of connectors
+synthetic_options = {
+    "pins": 6,
+    "wirecount": 4,
+    "color_codes": ["DIN", "IEC", "BW"],
+    "bundles": 0.2,
+    "loops": 0.1,
+    "mates": 0.1,
+    "images": 0.1,
+    "image_src": dir / "examples" / "resources" / "cable-WH+BN+GN+shield.png",
+    "additional_components": 0.2,
+    "seed": 0,
+}
+# skipped if GraphViz is not installed
+graphviz_phases = [
+    "svg_dot",
+    *(f"svg_dot_{profile}" for profile in LAYOUT_PROFILES),
+    "html",
+    "output",
+]
+
+
+def collect_inputs(corpus_keys, sizes):
+    """Return (name, input) for each benchmark input, input being a path or YAML data."""
+    inputs = []
+    for key in corpus_keys:
+        corpus = corpora[key]
+        if key == "synthetic":
+            for size in sizes:
+                data = synthetic_harness(size, **synthetic_options)
+                inputs.append((f"synthetic/{size}", data))
+        else:
+            for pattern in corpus["patterns"]:
+                for filename in sorted(corpus["path"].glob(pattern)):
+                    inputs.append((f"{key}/{filename.stem}", filename))
+    return inputs
+
+
+def measure(func, repeat):
+    """Return the median and minimum duration in seconds of calling func repeat times."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return {"median": statistics.median(durations), "min": min(durations)}
+
+
+def benchmark_input(inp, repeat, with_graphviz, workdir):
+    """Return the timings of each phase for one input."""
+    results = {}
+    parse_input = lambda: wireviz.parse(inp, return_types="harness")
+    results["parse"] = measure(parse_input, repeat)
+    harness = parse_input()
+    results["create_graph"] = measure(harness.create_graph, repeat)
+    results["generate_bom"] = measure(lambda: generate_bom(harness), repeat)
+
+    def svg(engine, profile):
+        def render():
+            harness.options.layout_engine = engine
+            harness.options.layout_profile = profile
+            harness.invalidate_cache()  # include creating the graph every time
+            harness.render("svg")
+
+        return render
+
+    # layout and SVG rendering by GraphViz compared with the native layout engine,
+    # with the layout profile of the input and with each of the layout profiles
+    engine, profile = harness.options.layout_engine, harness.options.layout_profile
+    if native_layout_problem(harness) is None:
+        results["svg_native"] = measure(svg("native", profile), repeat)
+    if with_graphviz:
+        results["svg_dot"] = measure(svg("dot", profile), repeat)
+        for layout_profile in LAYOUT_PROFILES:
+            timing = measure(svg("dot", layout_profile), repeat)
+            results[f"svg_dot_{layout_profile}"] = timing
+    harness.options.layout_engine = engine
+    harness.options.layout_profile = profile
+    if with_graphviz:
+        filename = Path(workdir) / "benchmark"
+        Path(f"{filename}.tmp.svg").write_text(harness.svg, encoding="utf-8")
+        bomlist = bom_list(harness.bom())
+        results["html"] = measure(
+            lambda: generate_html_output(
+                filename, bomlist, harness.metadata, harness.options
+            ),
+            repeat,
+        )
+
+        def output():
+            harness.invalidate_cache()  # measure the whole pipeline every time
+            harness.output(filename, fmt=("gv", "html", "png", "svg", "tsv"))
+
+        results["output"] = measure(output, repeat)
+    return results
+
+
+def run_benchmarks(corpus_keys, sizes, repeat):
+    with_graphviz = shutil.which("dot") is not None
+    if not with_graphviz:
+        print(f"GraphViz not found, skipping phases: {', '.join(graphviz_phases)}")
+    results = {}
+    with TemporaryDirectory() as workdir:
+        for name, inp in collect_inputs(corpus_keys, sizes):
+            print(f"  {name}")
+            for phase, timing in benchmark_input(
+                inp, repeat, with_graphviz, workdir
+            ).items():
+                results[f"{name}/{phase}"] = timing
+                print(f"    {phase:<18} {timing['median'] * 1000:10.2f} ms")
+    return {
+        "version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare_results(current, baseline, threshold):
+    """Print the change of each result against the baseline, return the regressions."""
+    regressions = []
+    for key, timing in current["results"].items():
+        base = baseline["results"].get(key)
+        if not base:
+            continue
+        change = timing["median"] / base["median"] - 1 if base["median"] else 0
+        flag = ""
+        if change > threshold:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print(f"  {key:<48} {change:+8.1%}{flag}")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description=f"{APP_NAME} Benchmark",
+    )
+    parser.add_argument(
+        "-V",
+        "--version",
+        action="version",
+        version=f"%(prog)s - {APP_NAME} {__version__}",
+    )
+    parser.add_argument(
+        "-g",
+        "--corpora",
+        nargs="+",
+        choices=corpora.keys(),
+        default=list(corpora.keys()),
+        help="the harness corpora to benchmark (default: all)",
+    )
+    parser.add_argument(
+        "-s",
+        "--sizes",
+        nargs="+",
+        type=int,
+        default=corpora["synthetic"]["sizes"],
+        help="the numbers of connectors of the synthetic harnesses (default: 10 100 1000)",
+    )
+    parser.add_argument(
+        "-r",
+        "--repeat",
+        type=int,
+        default=5,
+        help="how many times each phase is timed, the median is used (default: 5)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        help="JSON file to write the results to",
+    )
+    parser.add_argument(
+        "-b",
+        "--baseline",
+        type=Path,
+        help="JSON file with results of an earlier run to compare with",
+    )
+    parser.add_argument(
+        "-t",
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="slowdown against the baseline reported as regression (default: 0.1 = 10%%)",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    print(f"Benchmarking {', '.join(args.corpora)}")
+    results = run_benchmarks(args.corpora, args.sizes, args.repeat)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+        print(f'Results written to "{args.output}"')
+    if args.baseline:
+        print(f'Comparing with "{args.baseline}"')
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = compare_results(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
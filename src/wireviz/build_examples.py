@@ -2,18 +2,26 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import hashlib
+import json
 import os
+import subprocess
 import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
+import yaml
+
 script_path = Path(__file__).absolute()
 
 sys.path.insert(0, str(script_path.parent.parent))  # to find wireviz module
-from wv_helper import open_file_append, open_file_read, open_file_write
+from wv_helper import file_read_text, open_file_append, open_file_read, open_file_write
 
 from wireviz import APP_NAME, __version__, wireviz
 
 dir = script_path.parent.parent.parent
+# input and output hashes of the last build of each input file
+manifest_file = dir / ".build_examples.json"
 readme = "readme.md"
 groups = {
     "examples": {
@@ -51,45 +59,145 @@ def collect_filenames(description, groupkey, ext_list):
     return sorted([filename for pattern in patterns for filename in path.glob(pattern)])
 
 
-def build_generated(groupkeys):
+def file_hash(filename):
+    return hashlib.sha256(Path(filename).read_bytes()).hexdigest()
+
+
+def source_hash():
+    """Return a hash of the WireViz source code and built-in templates."""
+    digest = hashlib.sha256()
+    package = script_path.parent
+    for filename in sorted([*package.glob("*.py"), *package.glob("templates/*")]):
+        digest.update(f"{filename.relative_to(package).as_posix()}\n".encode("utf-8"))
+        digest.update(filename.read_bytes())
+    return digest.hexdigest()
+
+
+def input_files(yaml_file):
+    """Return the files the output of yaml_file depends on (besides the WireViz sources)."""
+    files = [yaml_file]
+    yaml_data = yaml.safe_load(file_read_text(yaml_file)) or {}
+    for section in ["connectors", "cables"]:
+        for attribs in (yaml_data.get(section) or {}).values():
+            image = (attribs or {}).get("image")
+            if isinstance(image, dict) and image.get("src"):
+                files.append(yaml_file.parent / image["src"])
+    template = ((yaml_data.get("metadata") or {}).get("template") or {}).get("name")
+    if template:
+        files.append(yaml_file.parent / f"{template}.html")
+    return [filename for filename in files if filename.is_file()]
+
+
+def input_hash(yaml_file, sources):
+    digest = hashlib.sha256(sources.encode("utf-8"))
+    for filename in input_files(yaml_file):
+        digest.update(f"{filename.name}:{file_hash(filename)}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def output_files(yaml_file):
+    return [yaml_file.with_suffix(ext) for ext in generated_extensions]
+
+
+def output_hashes(yaml_file):
+    return {
+        filename.name: file_hash(filename)
+        for filename in output_files(yaml_file)
+        if filename.is_file()
+    }
+
+
+def load_manifest():
+    if manifest_file.is_file():
+        return json.loads(manifest_file.read_text(encoding="utf-8"))
+    return {}
+
+
+def save_manifest(manifest):
+    manifest_file.write_text(
+        json.dumps(manifest, indent=2, sort_keys=True) + "\n", encoding="utf-8"
+    )
+
+
+def build_file(yaml_file):
+    """Build the outputs of one input file (run in a worker process)."""
+    wireviz.parse(yaml_file, output_formats=("gv", "html", "png", "svg", "tsv"))
+    return yaml_file
+
+
+def build_generated(groupkeys, jobs=None, force=False):
+    manifest = load_manifest()
+    sources = source_hash()
+    pending = {}  # input file: input hash
     for key in groupkeys:
-        # preparation
-        path = groups[key]["path"]
-        build_readme = readme in groups[key]
-        if build_readme:
-            include_readme = "md" in groups[key][readme]
-            include_source = "yml" in groups[key][readme]
-            with open_file_write(path / readme) as out:
-                out.write(f'# {groups[key]["title"]}\n\n')
-        # collect and iterate input YAML files
         for yaml_file in collect_filenames("Building", key, input_extensions):
+            entry = manifest.get(yaml_file.relative_to(dir).as_posix())
+            digest = input_hash(yaml_file, sources)
+            if (
+                not force
+                and entry
+                and entry["inputs"] == digest
+                and entry["outputs"] == output_hashes(yaml_file)
+            ):
+                print(f'  "{yaml_file}" is up to date')
+            else:
+                pending[yaml_file] = digest
+    # render the input files in parallel
+    failed = []
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(build_file, f): f for f in pending}
+        for future in as_completed(futures):
+            yaml_file = futures[future]
+            try:
+                future.result()
+            except Exception as error:  # keep the files built by the other workers
+                print(f'  "{yaml_file}" failed: {type(error).__name__}: {error}')
+                failed.append((yaml_file, error))
+                continue
             print(f'  "{yaml_file}"')
-            wireviz.parse(yaml_file, output_formats=("gv", "html", "png", "svg", "tsv"))
-
-            if build_readme:
-                i = "".join(filter(str.isdigit, yaml_file.stem))
-
-                with open_file_append(path / readme) as out:
-                    if include_readme:
-                        with open_file_read(yaml_file.with_suffix(".md")) as info:
-                            for line in info:
-                                out.write(line.replace("## ", f"## {i} - "))
-                            out.write("\n\n")
-                    else:
-                        out.write(f"## Example {i}\n")
-
-                    if include_source:
-                        with open_file_read(yaml_file) as src:
-                            out.write("```yaml\n")
-                            for line in src:
-                                out.write(line)
-                            out.write("```\n")
-                        out.write("\n")
-
-                    out.write(f"![]({yaml_file.stem}.png)\n\n")
-                    out.write(
-                        f"[Source]({yaml_file.name}) - [Bill of Materials]({yaml_file.stem}.bom.tsv)\n\n\n"
-                    )
+            manifest[yaml_file.relative_to(dir).as_posix()] = {
+                "inputs": pending[yaml_file],
+                "outputs": output_hashes(yaml_file),
+            }
+    save_manifest(manifest)
+    if failed:
+        yaml_file, error = failed[0]
+        raise Exception(f"{len(failed)} file(s) failed to build") from error
+    for key in groupkeys:
+        if readme in groups[key]:
+            build_readme(key)
+
+
+def build_readme(key):
+    path = groups[key]["path"]
+    include_readme = "md" in groups[key][readme]
+    include_source = "yml" in groups[key][readme]
+    with open_file_write(path / readme) as out:
+        out.write(f'# {groups[key]["title"]}\n\n')
+    for yaml_file in collect_filenames("Building readme for", key, input_extensions):
+        i = "".join(filter(str.isdigit, yaml_file.stem))
+
+        with open_file_append(path / readme) as out:
+            if include_readme:
+                with open_file_read(yaml_file.with_suffix(".md")) as info:
+                    for line in info:
+                        out.write(line.replace("## ", f"## {i} - "))
+                    out.write("\n\n")
+            else:
+                out.write(f"## Example {i}\n")
+
+            if include_source:
+                with open_file_read(yaml_file) as src:
+                    out.write("```yaml\n")
+                    for line in src:
+                        out.write(line)
+                    out.write("```\n")
+                out.write("\n")
+
+            out.write(f"![]({yaml_file.stem}.png)\n\n")
+            out.write(
+                f"[Source]({yaml_file.name}) - [Bill of Materials]({yaml_file.stem}.bom.tsv)\n\n\n"
+            )
 
 
 def clean_generated(groupkeys):
@@ -101,20 +209,67 @@ def clean_generated(groupkeys):
                 Path(filename).unlink()
 
 
-def compare_generated(groupkeys, branch="", include_graphviz_output=False):
+def git_blob_hashes(paths):
+    """
+    Return the hash git would store for each file, given as path relative to dir,
+    after applying the filters configured for it (e.g. core.autocrlf).
+    """
+    if not paths:
+        return {}
+    hashes = subprocess.run(
+        ["git", "hash-object", "--stdin-paths"],
+        cwd=dir,
+        input="\n".join(paths) + "\n",
+        stdout=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    ).stdout.split()
+    return dict(zip(paths, hashes))
+
+
+def committed_hashes(branch=""):
+    """Return the git blob hash of each file in branch, or in the index if no branch is given."""
     if branch:
-        branch = f" {branch.strip()}"
+        cmd = ["git", "ls-tree", "-r", "--full-tree", branch]
+    else:
+        cmd = ["git", "ls-files", "--stage"]
+    listing = subprocess.run(
+        cmd, cwd=dir, stdout=subprocess.PIPE, check=True, universal_newlines=True
+    ).stdout
+    hashes = {}
+    for line in listing.splitlines():
+        info, path = line.split("\t", 1)
+        hashes[path] = info.split()[2 if branch else 1]  # ls-tree lists the type first
+    return hashes
+
+
+def compare_generated(groupkeys, branch="", include_graphviz_output=False):
+    branch = branch.strip()
     compare_extensions = (
         generated_extensions
         if include_graphviz_output
         else extensions_not_containing_graphviz_output
     )
+    committed = committed_hashes(branch)
+    paths = []
     for key in groupkeys:
-        # collect and compare files
+        # collect files
         for filename in collect_filenames("Comparing", key, compare_extensions):
-            cmd = f'git --no-pager diff{branch} -- "{filename}"'
-            print(f"  {cmd}")
-            os.system(cmd)
+            paths.append(filename.relative_to(dir).as_posix())
+    # compare files
+    changed = []
+    for path, blob_hash in git_blob_hashes(paths).items():
+        if committed.get(path) != blob_hash:
+            print(f"  changed: {path}")
+            changed.append(path)
+    if changed:
+        # show the differences of all changed files at once
+        cmd = ["git", "--no-pager", "diff", *([branch] if branch else [])]
+        cmd += ["--", *changed]
+        print(f"  {' '.join(cmd)}")
+        subprocess.run(cmd, cwd=dir)
+    else:
+        print("  no changes")
 
 
 def restore_generated(groupkeys, branch=""):
@@ -167,6 +322,19 @@ def parse_args():
         default="",
         help="branch or commit to compare with or restore from",
     )
+    parser.add_argument(
+        "-f",
+        "--force",
+        action="store_true",
+        help="rebuild all files, even if their inputs are unchanged (default: False)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="number of files built in parallel (default: number of CPUs)",
+    )
     parser.add_argument(
         "-g",
         "--groups",
@@ -181,7 +349,7 @@ def parse_args():
 def main():
     args = parse_args()
     if args.action == "build":
-        build_generated(args.groups)
+        build_generated(args.groups, args.jobs, args.force)
     elif args.action == "clean":
         clean_generated(args.groups)
     elif args.action == "compare" or args.action == "diff":
@@ -2,17 +2,35 @@
 
 import base64
 import re
+from functools import lru_cache
 from pathlib import Path
 from typing import Union
 
 mime_subtype_replacements = {"jpg": "jpeg", "tif": "tiff"}
 
 
-# TODO: Share cache and code between data_URI_base64() and embed_svg_images()
+def base64_file(file: Union[str, Path]) -> str:
+    """Return Base64-encoded contents of input file."""
+    return base64.b64encode(Path(file).read_bytes()).decode("utf-8")
+
+
+def base64_file_cached(file: Union[str, Path]) -> str:
+    """Return Base64-encoded contents of input file, cached until the file changes."""
+    file = Path(file).resolve()
+    stat = file.stat()
+    return _base64_file_cached(file, stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=128)
+def _base64_file_cached(file: Path, mtime_ns: int, size: int) -> str:
+    # mtime_ns and size are only part of the cache key
+    return base64_file(file)
+
+
 def data_URI_base64(file: Union[str, Path], media: str = "image") -> str:
     """Return Base64-encoded data URI of input file."""
     file = Path(file)
-    b64 = base64.b64encode(file.read_bytes()).decode("utf-8")
+    b64 = base64_file(file)
     uri = f"data:{media}/{get_mime_subtype(file)};base64, {b64}"
     # print(f"data_URI_base64('{file}', '{media}') -> {len(uri)}-character URI")
     if len(uri) > 65535:
@@ -22,7 +40,9 @@ def data_URI_base64(file: Union[str, Path], media: str = "image") -> str:
     return uri
 
 
-def embed_svg_images(svg_in: str, base_path: Union[str, Path] = Path.cwd()) -> str:
+def embed_svg_images(svg_in: str, base_path: Union[None, str, Path] = None) -> str:
+    if base_path is None:
+        base_path = Path.cwd()  # evaluated per call, not once at import time
     images_b64 = {}  # cache of base64-encoded images
 
     def image_tag(pre: str, url: str, post: str) -> str:
@@ -30,10 +50,8 @@ def embed_svg_images(svg_in: str, base_path: Union[str, Path] = Path.cwd()) -> s
 
     def replace(match: re.Match) -> str:
         imgurl = match["URL"]
-        if not imgurl in images_b64:  # only encode/cache every unique URL once
-            imgurl_abs = (Path(base_path) / imgurl).resolve()
-            image = imgurl_abs.read_bytes()
-            images_b64[imgurl] = base64.b64encode(image).decode("utf-8")
+        if not imgurl in images_b64:  # only look up every unique URL once
+            images_b64[imgurl] = base64_file_cached(Path(base_path) / imgurl)
         return image_tag(
             match["PRE"] or "",
             f"data:image/{get_mime_subtype(imgurl)};base64, {images_b64[imgurl]}",
@@ -3,10 +3,9 @@
 
 import platform
 import sys
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict, List, Tuple, Union
-
-import yaml
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 if __name__ == "__main__":
     sys.path.insert(0, str(Path(__file__).parent.parent))  # add src/wireviz to PATH
@@ -20,6 +19,7 @@ from wireviz.wv_helper import (
     is_arrow,
     smart_file_resolve,
 )
+from wireviz.wv_timing import span
 
 from . import APP_NAME
 
@@ -30,7 +30,10 @@ def parse(
     output_formats: Union[None, str, Tuple[str]] = None,
     output_dir: Union[str, Path] = None,
     output_name: Union[None, str] = None,
-    image_paths: Union[Path, str, List] = [],
+    image_paths: Union[None, Path, str, List] = None,
+    preview: bool = False,
+    focus: Union[None, str, List[str]] = None,
+    depth: int = 2,
 ) -> Any:
     """
     This function takes an input, parses it as a WireViz Harness file,
@@ -40,6 +43,7 @@ def parse(
         * A path to a YAML source file to parse
         * A string containing the YAML data to parse
         * A Python Dict containing the pre-parsed YAML data
+          (left unchanged, so it can be cached and parsed again, e.g. with other options)
 
     Supported return types:
         * "png":     the diagram as raw PNG data
@@ -48,12 +52,16 @@ def parse(
 
     Supported output formats:
         * "csv":  the BOM, as a comma-separated text file
+        * "geometry": positions of components, pins and wires in the diagram, as JSON
         * "gv":   the diagram, as a GraphViz source file
+        * "graphjson": the components and connections before layout, as a JSON file
         * "html": the diagram and (depending on the template) the BOM, as a HTML file
+        * "json": the laid out diagram, in the GraphViz JSON format
         * "png":  the diagram, as a PNG raster image
         * "pdf":  the diagram and (depending on the template) the BOM, as a PDF file
         * "svg":  the diagram, as a SVG vector image
         * "tsv":  the BOM, as a tab-separated text file
+        * "xdot": the laid out diagram, in the GraphViz xdot format
 
     Args:
         inp (Path | str | Dict):
@@ -75,6 +83,17 @@ def parse(
             Paths to use when resolving any image paths included in the data.
             Note: If inp is a path to a YAML file,
             its parent directory will automatically be included in the list.
+        preview (bool, optional):
+            If True, generate a low-fidelity diagram much faster, showing only
+            the component names and one edge per pair of joined components.
+            Same as setting preview: true in the options section of the input.
+        focus (str | List, optional):
+            Designator(s) of connectors and/or cables to focus on.
+            If set, the diagram only shows the components within depth hops
+            of these (see Harness.neighborhood()). The BOM is not affected.
+        depth (int, optional):
+            Number of hops from the focus designators to include. Defaults to 2,
+            i.e. the cables attached to a focused connector and their far-end connectors.
 
     Returns:
         Depending on the return_types parameter, may return:
@@ -88,17 +107,170 @@ def parse(
     if not output_formats and not return_types:
         raise Exception("No output formats or return types specified")
 
-    yaml_data, yaml_file = _get_yaml_data_and_path(inp)
+    with span("parse"):
+        harness, output_file = _parse_harness(
+            inp,
+            output_formats=output_formats,
+            output_dir=output_dir,
+            output_name=output_name,
+            image_paths=image_paths,
+            preview=preview,
+            focus=focus,
+            depth=depth,
+        )
+
+    if output_formats:
+        with span("output"):
+            harness.output(filename=output_file, fmt=output_formats, view=False)
+
+    if return_types:
+        return_types = _lower_list(return_types)
+        # lay out once for all graphical return types, the properties read the cache
+        harness.render([rt for rt in return_types if rt in ("png", "svg")])
+        returns = []
+        for rt in return_types:
+            if rt == "png":
+                returns.append(harness.png)
+            if rt == "svg":
+                returns.append(harness.svg)
+            if rt == "harness":
+                returns.append(harness)
+
+        return tuple(returns) if len(returns) != 1 else returns[0]
+
+
+async def parse_async(
+    inp: Union[Path, str, Dict],
+    return_types: Union[None, str, Tuple[str]] = None,
+    output_formats: Union[None, str, Tuple[str]] = None,
+    output_dir: Union[str, Path] = None,
+    output_name: Union[None, str] = None,
+    image_paths: Union[None, Path, str, List] = None,
+    preview: bool = False,
+    focus: Union[None, str, List[str]] = None,
+    depth: int = 2,
+) -> Any:
+    """
+    Same as parse(), but running GraphViz as asyncio subprocesses
+    without blocking the event loop. See parse() for details.
+    """
+
+    if not output_formats and not return_types:
+        raise Exception("No output formats or return types specified")
+
+    with span("parse"):
+        harness, output_file = _parse_harness(
+            inp,
+            output_formats=output_formats,
+            output_dir=output_dir,
+            output_name=output_name,
+            image_paths=image_paths,
+            preview=preview,
+            focus=focus,
+            depth=depth,
+        )
+
+    if output_formats:
+        with span("output"):
+            await harness.output_async(filename=output_file, fmt=output_formats)
+
+    if return_types:
+        return_types = _lower_list(return_types)
+        # lay out once for all graphical return types, the properties read the cache
+        await harness.render_async([rt for rt in return_types if rt in ("png", "svg")])
+        returns = []
+        for rt in return_types:
+            if rt == "png":
+                returns.append(harness.png)
+            if rt == "svg":
+                returns.append(harness.svg)
+            if rt == "harness":
+                returns.append(harness)
+
+        return tuple(returns) if len(returns) != 1 else returns[0]
+
+
+def check(
+    inp: Union[Path, str, Dict],
+    image_paths: Union[None, Path, str, List] = None,
+) -> List[str]:
+    """
+    Validate the input like parse() does, and generate the BOM, without generating
+    the diagram or any output files. Return all errors found, an empty list if valid.
+    Errors in one component or connection set do not stop the checking of the others.
+    """
+    errors = []
+    try:
+        with span("parse"):
+            harness, _ = _parse_harness(
+                inp,
+                output_formats=None,
+                output_dir=None,
+                output_name=None,
+                image_paths=image_paths,
+                preview=False,
+                focus=None,
+                depth=2,
+                errors=errors,
+            )
+        harness.bom()
+    except Exception as error:  # e.g. invalid YAML or options, no harness to check
+        errors.append(str(error))
+    return errors
+
+
+def _lower_list(inp: Union[str, Tuple[str]]) -> List[str]:
+    if isinstance(inp, str):  # only one item speficied
+        inp = [inp]
+    return [t.lower() for t in inp]
+
+
+def _parse_harness(
+    inp: Union[Path, str, Dict],
+    output_formats: Union[None, str, Tuple[str]],
+    output_dir: Union[str, Path],
+    output_name: Union[None, str],
+    image_paths: Union[None, Path, str, List],
+    preview: bool,
+    focus: Union[None, str, List[str]],
+    depth: int,
+    errors: Optional[List[str]] = None,
+) -> Tuple[Harness, Optional[Path]]:
+    """
+    Return the harness parsed from inp, and the output file path (without extension) if needed.
+    If errors is a list, errors in components and connection sets are appended to it
+    and parsing continues, instead of raising an exception at the first error.
+    """
+
+    @contextmanager
+    def collecting_errors(location: str):
+        if errors is None:
+            yield
+            return
+        try:
+            yield
+        except Exception as error:
+            errors.append(f"{location}: {error}")
+
+    output_file = None
+    with span("load"):
+        yaml_data, yaml_file = _get_yaml_data_and_path(inp)
     if not isinstance(yaml_data, dict):
         raise TypeError(
             f"Expected a dict as top-level YAML input, but got: {type(yaml_data)}"
         )
+    # missing sections are added below, so work on a copy of the input
+    yaml_data = dict(yaml_data)
     if output_formats:
         # need to write data to file, determine output directory and filename
         output_dir = _get_output_dir(yaml_file, output_dir)
         output_name = _get_output_name(yaml_file, output_name)
         output_file = output_dir / output_name
 
+    # work on a copy to leave the caller's list untouched
+    if isinstance(image_paths, (str, Path)):
+        image_paths = [image_paths]
+    image_paths = list(image_paths or [])
     if yaml_file:
         # if reading from file, ensure that input file's parent directory is included in image_paths
         default_image_path = yaml_file.parent.resolve()
@@ -116,6 +288,8 @@ def parse(
         options=Options(**yaml_data.get("options", {})),
         tweak=Tweak(**yaml_data.get("tweak", {})),
     )
+    if preview:
+        harness.options.preview = True
     # others
     # store mapping of components to their respective template
     designators_and_templates = {}
@@ -141,10 +315,23 @@ def parse(
                         if isinstance(image, dict):
                             image_path = image["src"]
                             if image_path and not Path(image_path).is_absolute():
-                                # resolve relative image path
-                                image["src"] = smart_file_resolve(
-                                    image_path, image_paths
-                                )
+                                # resolve relative image path into copies of the dicts,
+                                # leaving the input data untouched
+                                try:
+                                    image_path = smart_file_resolve(
+                                        image_path, image_paths
+                                    )
+                                except Exception as error:
+                                    if errors is None:
+                                        raise
+                                    errors.append(f"{sec}.{key}: {error}")
+                                    # check the component without its image
+                                    attribs = {
+                                        k: v for k, v in attribs.items() if k != "image"
+                                    }
+                                else:
+                                    image = {**image, "src": image_path}
+                                    attribs = {**attribs, "image": image}
                         if sec == "connectors":
                             template_connectors[key] = attribs
                         elif sec == "cables":
@@ -208,159 +395,169 @@ def parse(
         nonlocal expected_type
         expected_type = alternating_types[1 - alternating_types.index(expected_type)]
 
-    for connection_set in connection_sets:
-        # figure out number of parallel connections within this set
-        connectioncount = []
-        for entry in connection_set:
-            if isinstance(entry, list):
-                connectioncount.append(len(entry))
-            elif isinstance(entry, dict):
-                connectioncount.append(len(expand(list(entry.values())[0])))
-                # e.g.: - X1: [1-4,6] yields 5
-            else:
-                pass  # strings do not reveal connectioncount
-        if not any(connectioncount):
-            # no item in the list revealed connection count;
-            # assume connection count is 1
-            connectioncount = [1]
-            # Example: The following is a valid connection set,
-            #          even though no item reveals the connection count;
-            #          the count is not needed because only a component-level mate happens.
-            # -
-            #   - CONNECTOR
-            #   - ==>
-            #   - CONNECTOR
-
-        # check that all entries are the same length
-        if len(set(connectioncount)) > 1:
-            raise Exception(
-                "All items in connection set must reference the same number of connections"
-            )
-        # all entries are the same length, connection count is set
-        connectioncount = connectioncount[0]
-
-        # expand string entries to list entries of correct length
-        for index, entry in enumerate(connection_set):
-            if isinstance(entry, str):
-                connection_set[index] = [entry] * connectioncount
-
-        # resolve all designators
-        for index, entry in enumerate(connection_set):
-            if isinstance(entry, list):
-                for subindex, item in enumerate(entry):
+    for index, connection_set in enumerate(connection_sets):
+        with collecting_errors(f"connections[{index}]"):
+            # the entries are rewritten in place below, so work on a copy of the input
+            connection_set = [
+                list(entry) if isinstance(entry, list) else entry
+                for entry in connection_set
+            ]
+            # figure out number of parallel connections within this set
+            connectioncount = []
+            for entry in connection_set:
+                if isinstance(entry, list):
+                    connectioncount.append(len(entry))
+                elif isinstance(entry, dict):
+                    connectioncount.append(len(expand(list(entry.values())[0])))
+                    # e.g.: - X1: [1-4,6] yields 5
+                else:
+                    pass  # strings do not reveal connectioncount
+            if not any(connectioncount):
+                # no item in the list revealed connection count;
+                # assume connection count is 1
+                connectioncount = [1]
+                # Example: The following is a valid connection set,
+                #          even though no item reveals the connection count;
+                #          the count is not needed because only a component-level mate happens.
+                # -
+                #   - CONNECTOR
+                #   - ==>
+                #   - CONNECTOR
+
+            # check that all entries are the same length
+            if len(set(connectioncount)) > 1:
+                raise Exception(
+                    "All items in connection set must reference the same number of connections"
+                )
+            # all entries are the same length, connection count is set
+            connectioncount = connectioncount[0]
+
+            # expand string entries to list entries of correct length
+            for index, entry in enumerate(connection_set):
+                if isinstance(entry, str):
+                    connection_set[index] = [entry] * connectioncount
+
+            # resolve all designators
+            for index, entry in enumerate(connection_set):
+                if isinstance(entry, list):
+                    for subindex, item in enumerate(entry):
+                        template, designator = resolve_designator(
+                            item, template_separator_char
+                        )
+                        connection_set[index][subindex] = designator
+                elif isinstance(entry, dict):
+                    key = list(entry.keys())[0]
                     template, designator = resolve_designator(
-                        item, template_separator_char
+                        key, template_separator_char
                     )
-                    connection_set[index][subindex] = designator
-            elif isinstance(entry, dict):
-                key = list(entry.keys())[0]
-                template, designator = resolve_designator(key, template_separator_char)
-                value = entry[key]
-                connection_set[index] = {designator: value}
-            else:
-                pass  # string entries have been expanded in previous step
-
-        # expand all pin lists
-        for index, entry in enumerate(connection_set):
-            if isinstance(entry, list):
-                connection_set[index] = [{designator: 1} for designator in entry]
-            elif isinstance(entry, dict):
-                designator = list(entry.keys())[0]
-                pinlist = expand(entry[designator])
-                connection_set[index] = [{designator: pin} for pin in pinlist]
-            else:
-                pass  # string entries have been expanded in previous step
-
-        # Populate wiring harness ==============================================
-
-        expected_type = None  # reset check for alternating types
-        # at the beginning of every connection set
-        # since each set may begin with either type
-
-        # generate components
-        for entry in connection_set:
-            for item in entry:
-                designator = list(item.keys())[0]
-                template = designators_and_templates[designator]
-
-                if designator in harness.connectors:  # existing connector instance
-                    check_type(designator, template, "connector")
-                elif template in template_connectors.keys():
-                    # generate new connector instance from template
-                    check_type(designator, template, "connector")
-                    harness.add_connector(
-                        name=designator, **template_connectors[template]
-                    )
-
-                elif designator in harness.cables:  # existing cable instance
-                    check_type(designator, template, "cable/arrow")
-                elif template in template_cables.keys():
-                    # generate new cable instance from template
-                    check_type(designator, template, "cable/arrow")
-                    harness.add_cable(name=designator, **template_cables[template])
-
-                elif is_arrow(designator):
-                    check_type(designator, template, "cable/arrow")
-                    # arrows do not need to be generated here
+                    value = entry[key]
+                    connection_set[index] = {designator: value}
                 else:
-                    raise Exception(
-                        f"{template} is an unknown template/designator/arrow."
-                    )
+                    pass  # string entries have been expanded in previous step
+
+            # expand all pin lists
+            for index, entry in enumerate(connection_set):
+                if isinstance(entry, list):
+                    connection_set[index] = [{designator: 1} for designator in entry]
+                elif isinstance(entry, dict):
+                    designator = list(entry.keys())[0]
+                    pinlist = expand(entry[designator])
+                    connection_set[index] = [{designator: pin} for pin in pinlist]
+                else:
+                    pass  # string entries have been expanded in previous step
+
+            # Populate wiring harness ==============================================
+
+            expected_type = None  # reset check for alternating types
+            # at the beginning of every connection set
+            # since each set may begin with either type
+
+            # generate components
+            for entry in connection_set:
+                for item in entry:
+                    designator = list(item.keys())[0]
+                    template = designators_and_templates[designator]
+
+                    if designator in harness.connectors:  # existing connector instance
+                        check_type(designator, template, "connector")
+                    elif template in template_connectors.keys():
+                        # generate new connector instance from template
+                        check_type(designator, template, "connector")
+                        harness.add_connector(
+                            name=designator, **template_connectors[template]
+                        )
 
-            alternate_type()  # entries in connection set must alternate between connectors and cables/arrows
+                    elif designator in harness.cables:  # existing cable instance
+                        check_type(designator, template, "cable/arrow")
+                    elif template in template_cables.keys():
+                        # generate new cable instance from template
+                        check_type(designator, template, "cable/arrow")
+                        harness.add_cable(name=designator, **template_cables[template])
 
-        # transpose connection set list
-        # before: one item per component, one subitem per connection in set
-        # after:  one item per connection in set, one subitem per component
-        connection_set = list(map(list, zip(*connection_set)))
+                    elif is_arrow(designator):
+                        check_type(designator, template, "cable/arrow")
+                        # arrows do not need to be generated here
+                    else:
+                        raise Exception(
+                            f"{template} is an unknown template/designator/arrow."
+                        )
 
-        # connect components
-        for index_entry, entry in enumerate(connection_set):
-            for index_item, item in enumerate(entry):
-                designator = list(item.keys())[0]
+                alternate_type()  # entries in connection set must alternate between connectors and cables/arrows
+
+            # transpose connection set list
+            # before: one item per component, one subitem per connection in set
+            # after:  one item per connection in set, one subitem per component
+            connection_set = list(map(list, zip(*connection_set)))
+
+            # connect components
+            for index_entry, entry in enumerate(connection_set):
+                for index_item, item in enumerate(entry):
+                    designator = list(item.keys())[0]
+
+                    if designator in harness.cables:
+                        if index_item == 0:
+                            # list started with a cable, no connector to join on left side
+                            from_name, from_pin = (None, None)
+                        else:
+                            from_name, from_pin = get_single_key_and_value(
+                                entry[index_item - 1]
+                            )
+                        via_name, via_pin = (designator, item[designator])
+                        if index_item == len(entry) - 1:
+                            # list ends with a cable, no connector to join on right side
+                            to_name, to_pin = (None, None)
+                        else:
+                            to_name, to_pin = get_single_key_and_value(
+                                entry[index_item + 1]
+                            )
+                        harness.connect(
+                            from_name, from_pin, via_name, via_pin, to_name, to_pin
+                        )
+
+                    elif is_arrow(designator):
+                        if index_item == 0:  # list starts with an arrow
+                            raise Exception(
+                                "An arrow cannot be at the start of a connection set"
+                            )
+                        elif index_item == len(entry) - 1:  # list ends with an arrow
+                            raise Exception(
+                                "An arrow cannot be at the end of a connection set"
+                            )
 
-                if designator in harness.cables:
-                    if index_item == 0:
-                        # list started with a cable, no connector to join on left side
-                        from_name, from_pin = (None, None)
-                    else:
                         from_name, from_pin = get_single_key_and_value(
                             entry[index_item - 1]
                         )
-                    via_name, via_pin = (designator, item[designator])
-                    if index_item == len(entry) - 1:
-                        # list ends with a cable, no connector to join on right side
-                        to_name, to_pin = (None, None)
-                    else:
+                        via_name, via_pin = (designator, None)
                         to_name, to_pin = get_single_key_and_value(
                             entry[index_item + 1]
                         )
-                    harness.connect(
-                        from_name, from_pin, via_name, via_pin, to_name, to_pin
-                    )
-
-                elif is_arrow(designator):
-                    if index_item == 0:  # list starts with an arrow
-                        raise Exception(
-                            "An arrow cannot be at the start of a connection set"
-                        )
-                    elif index_item == len(entry) - 1:  # list ends with an arrow
-                        raise Exception(
-                            "An arrow cannot be at the end of a connection set"
-                        )
-
-                    from_name, from_pin = get_single_key_and_value(
-                        entry[index_item - 1]
-                    )
-                    via_name, via_pin = (designator, None)
-                    to_name, to_pin = get_single_key_and_value(entry[index_item + 1])
-                    if "-" in designator:  # mate pin by pin
-                        harness.add_mate_pin(
-                            from_name, from_pin, to_name, to_pin, designator
-                        )
-                    elif "=" in designator and index_entry == 0:
-                        # mate two connectors as a whole
-                        harness.add_mate_component(from_name, to_name, designator)
+                        if "-" in designator:  # mate pin by pin
+                            harness.add_mate_pin(
+                                from_name, from_pin, to_name, to_pin, designator
+                            )
+                        elif "=" in designator and index_entry == 0:
+                            # mate two connectors as a whole
+                            harness.add_mate_component(from_name, to_name, designator)
 
     # warn about unused templates
 
@@ -378,28 +575,15 @@ def parse(
     # harness population completed =============================================
 
     if "additional_bom_items" in yaml_data:
-        for line in yaml_data["additional_bom_items"]:
-            harness.add_bom_item(line)
-
-    if output_formats:
-        harness.output(filename=output_file, fmt=output_formats, view=False)
+        for index, line in enumerate(yaml_data["additional_bom_items"]):
+            with collecting_errors(f"additional_bom_items[{index}]"):
+                harness.add_bom_item(line)
 
-    if return_types:
-        returns = []
-        if isinstance(return_types, str):  # only one return type speficied
-            return_types = [return_types]
+    if focus:
+        with collecting_errors("focus"):
+            harness.set_focus([focus] if isinstance(focus, str) else focus, depth)
 
-        return_types = [t.lower() for t in return_types]
-
-        for rt in return_types:
-            if rt == "png":
-                returns.append(harness.png)
-            if rt == "svg":
-                returns.append(harness.svg)
-            if rt == "harness":
-                returns.append(harness)
-
-        return tuple(returns) if len(returns) != 1 else returns[0]
+    return harness, output_file
 
 
 def _get_yaml_data_and_path(inp: Union[str, Path, Dict]) -> (Dict, Path):
@@ -427,6 +611,8 @@ def _get_yaml_data_and_path(inp: Union[str, Path, Dict]) -> (Dict, Path):
             # file does not exist; assume inp is a YAML string
             yaml_str = inp
             yaml_path = None
+        import yaml  # deferred, not needed for pre-parsed input
+
         yaml_data = yaml.safe_load(yaml_str)
     else:
         # received a Dict, use as-is
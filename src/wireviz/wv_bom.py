@@ -2,7 +2,7 @@
 
 from dataclasses import asdict
 from itertools import groupby
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 from wireviz.DataClasses import AdditionalComponent, Cable, Color, Connector
 from wireviz.wv_colors import translate_color
@@ -215,6 +215,47 @@ def generate_bom(harness: "Harness") -> List[BOMEntry]:
     return [{**entry, "id": index} for index, entry in enumerate(bom, 1)]
 
 
+def merge_boms(boms: Iterable[Tuple[str, List[BOMEntry]]]) -> List[BOMEntry]:
+    """
+    Return one BOM joining the entries of many harness BOMs, given as (harness name, BOM).
+    Quantities of equal entries are summed, and designators are prefixed by the harness
+    name. The "harnesses" field of each entry maps harness names to their quantity and
+    designators. The BOMs are consumed one by one in a single pass, so they may be
+    generated lazily. Harness names must be unique.
+    """
+    merged: Dict[BOMKey, BOMEntry] = {}
+    names = set()
+    for name, bom in boms:
+        if name in names:
+            raise Exception(f"Harness name {name} is used more than once")
+        names.add(name)
+        for entry in bom:
+            key = bom_entry_key(entry)  # includes the unit
+            target = merged.get(key)
+            if target is None:
+                target = {**entry, "qty": 0, "designators": [], "harnesses": {}}
+                del target["id"]
+                merged[key] = target
+            qty = entry.get("qty", 1)
+            designators = make_list(entry.get("designators"))
+            target["qty"] += qty
+            target["designators"].extend(f"{name}:{d}" for d in designators)
+            harness = target["harnesses"].setdefault(
+                name, {"qty": 0, "designators": []}
+            )
+            harness["qty"] += qty
+            harness["designators"].extend(designators)
+    bom = []
+    for key in sorted(merged):
+        entry = merged[key]
+        total_qty = entry["qty"]
+        entry["qty"] = (
+            int(total_qty) if float(total_qty).is_integer() else round(total_qty, 3)
+        )
+        bom.append({**entry, "id": len(bom) + 1})
+    return bom
+
+
 def get_bom_index(bom: List[BOMEntry], target: BOMKey) -> int:
     """Return id of BOM entry or raise exception if not found."""
     for entry in bom:
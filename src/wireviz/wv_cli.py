@@ -2,30 +2,44 @@
 
 import os
 import sys
+from contextlib import nullcontext, redirect_stdout
 from pathlib import Path
+from typing import List, Set, Union
 
 import click
 
 if __name__ == "__main__":
     sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
-import wireviz.wireviz as wv
-from wireviz import APP_NAME, __version__
-from wireviz.wv_helper import file_read_text
+from wireviz import APP_NAME, CMD_NAME, __version__
+from wireviz.wv_helper import file_read_text, file_write_text_if_changed
 
 format_codes = {
     # "c": "csv",
     "g": "gv",
     "h": "html",
+    "j": "graphjson",
+    "J": "json",
     "p": "png",
     # "P": "pdf",
     "s": "svg",
     "t": "tsv",
+    "x": "xdot",
+    "G": "geometry",
+}
+# file name suffixes of output formats not simply named .<format>
+output_suffixes = {
+    "geometry": ".geometry.json",
+    "graphjson": ".graph.json",
+    "tsv": ".bom.tsv",
 }
 
 epilog = "The -f or --format option accepts a string containing one or more of the "
 epilog += "following characters to specify which file types to output:\n"
 epilog += ", ".join([f"{key} ({value.upper()})" for key, value in format_codes.items()])
+epilog += "\n\nRun '" + CMD_NAME + " serve --help' for the render server mode, "
+epilog += "'" + CMD_NAME + " worker --help' for the spool worker mode, and '"
+epilog += CMD_NAME + " bom-merge --help' for merging the BOMs of many files."
 
 
 @click.command(
@@ -64,6 +78,65 @@ epilog += ", ".join([f"{key} ({value.upper()})" for key, value in format_codes.i
     type=str,
     help="File name (without extension) to use for output files, if different from input file name.",
 )
+@click.option(
+    "--preview",
+    is_flag=True,
+    default=False,
+    help="Generate a fast low-fidelity diagram with only component names and connections.",
+)
+@click.option(
+    "--focus",
+    default=[],
+    multiple=True,
+    type=str,
+    help="Designator of a connector or cable to focus on; only its neighborhood is drawn (optional, repeatable).",
+)
+@click.option(
+    "--depth",
+    default=2,
+    type=int,
+    show_default=True,
+    help="Number of hops from the --focus designators to draw.",
+)
+@click.option(
+    "-c",
+    "--check",
+    is_flag=True,
+    default=False,
+    help="Only check the input files for errors, without generating any outputs.",
+)
+@click.option(
+    "-w",
+    "--watch",
+    is_flag=True,
+    default=False,
+    help="Keep running and regenerate the outputs when input files change.",
+)
+@click.option(
+    "-d",
+    "--depfile",
+    is_flag=True,
+    default=False,
+    help="Write a Make/Ninja depfile (.d) listing the files the outputs depend on.",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    help="Print the time spent in each processing phase for each file.",
+)
+@click.option(
+    "--profile-memory",
+    is_flag=True,
+    default=False,
+    help="Print the peak memory usage of each processing phase for each file (slow).",
+)
+@click.option(
+    "--profile-stats",
+    default=None,
+    type=Path,
+    help="File to dump cProfile statistics of processing all files to (optional).",
+)
 @click.option(
     "-V",
     "--version",
@@ -71,7 +144,23 @@ epilog += ", ".join([f"{key} ({value.upper()})" for key, value in format_codes.i
     default=False,
     help=f"Output {APP_NAME} version and exit.",
 )
-def wireviz(file, format, prepend, output_dir, output_name, version):
+def wireviz(
+    file,
+    format,
+    prepend,
+    output_dir,
+    output_name,
+    preview,
+    focus,
+    depth,
+    check,
+    watch,
+    depfile,
+    profile,
+    profile_memory,
+    profile_stats,
+    version,
+):
     """
     Parses the provided FILE and generates the specified outputs.
     """
@@ -80,6 +169,14 @@ def wireviz(file, format, prepend, output_dir, output_name, version):
     if version:
         return  # print version number only and exit
 
+    import wireviz.wireviz as wv  # deferred to keep printing the version fast
+    from wireviz.wv_timing import collect_memory, collect_timings
+
+    if profile_stats:
+        import cProfile
+
+        profiler = cProfile.Profile()
+
     # get list of files
     try:
         _ = iter(file)
@@ -102,8 +199,7 @@ def wireviz(file, format, prepend, output_dir, output_name, version):
         else output_formats[0]
     )
 
-    # check prepend file
-    if len(prepend) > 0:
+    def read_prepend_files() -> str:
         prepend_input = ""
         for prepend_file in prepend:
             prepend_file = Path(prepend_file)
@@ -112,42 +208,382 @@ def wireviz(file, format, prepend, output_dir, output_name, version):
             print("Prepend file:", prepend_file)
 
             prepend_input += file_read_text(prepend_file) + "\n"
-    else:
-        prepend_input = ""
-
-    # run WireVIz on each input file
-    for file in filepaths:
-        file = Path(file)
-        if not file.exists():
-            raise Exception(f"File does not exist:\n{file}")
+        return prepend_input
 
-        # file_out = file.with_suffix("") if not output_file else output_file
+    def output_path(file: Path) -> Path:
         _output_dir = file.parent if not output_dir else output_dir
         _output_name = file.stem if not output_name else output_name
+        return Path(_output_dir) / _output_name
 
+    def read_input(file: Path) -> str:
+        if not file.exists():
+            raise Exception(f"File does not exist:\n{file}")
         print("Input file:  ", file)
-        print(
-            "Output file: ", f"{Path(_output_dir / _output_name)}.{output_formats_str}"
+        print("Output file: ", f"{output_path(file)}.{output_formats_str}")
+        return prepend_input + file_read_text(file)
+
+    def image_paths(file: Path) -> List[Path]:
+        return list({file.parent, *(Path(p).parent for p in prepend)})
+
+    def build(file: Path, yaml_input: Union[str, dict]):
+        """Generate the outputs of one input file and return its harness."""
+        output = output_path(file)
+
+        memory_context = collect_memory() if profile_memory else nullcontext()
+        with collect_timings() as timings, memory_context as memory:
+            if profile_stats:
+                profiler.enable()
+            harness = wv.parse(
+                yaml_input,
+                return_types="harness",
+                output_formats=output_formats,
+                output_dir=output.parent,
+                output_name=output.name,
+                image_paths=image_paths(file),
+                preview=preview,
+                focus=list(focus),
+                depth=depth,
+            )
+            if profile_stats:
+                profiler.disable()
+        if depfile:
+            write_dependencies(file, harness)
+        if profile:
+            print(timings.report())
+        if profile_memory:
+            print(memory.report())
+        return harness
+
+    def dependencies(file: Path, harness) -> List[Path]:
+        output = output_path(file)
+        return [file, *map(Path, prepend), *harness.input_files(output, output_formats)]
+
+    def write_dependencies(file: Path, harness) -> None:
+        output = output_path(file)
+        write_depfile(
+            Path(f"{output}.d"),
+            [f"{output}{output_suffixes.get(f, '.' + f)}" for f in output_formats],
+            dependencies(file, harness),
         )
 
-        yaml_input = file_read_text(file)
-        file_dir = file.parent
+    prepend_input = read_prepend_files()
 
-        yaml_input = prepend_input + yaml_input
-        image_paths = {file_dir}
-        for p in prepend:
-            image_paths.add(Path(p).parent)
+    # run WireVIz on each input file
+    filepaths = [Path(file) for file in filepaths]
+    if check:
+        invalid = 0
+        for file in filepaths:
+            if not file.exists():
+                raise Exception(f"File does not exist:\n{file}")
+            print("Input file:  ", file)
+            errors = wv.check(
+                prepend_input + file_read_text(file), image_paths=image_paths(file)
+            )
+            for error in errors:
+                print(f"Error: {error}")
+            invalid += bool(errors)
+        print()
+        print(f"{len(filepaths) - invalid} of {len(filepaths)} file(s) valid")
+        if invalid:
+            sys.exit(1)
+        return
+    if not watch:
+        for file in filepaths:
+            build(file, read_input(file))
+    else:
+        import yaml
 
-        wv.parse(
-            yaml_input,
-            output_formats=output_formats,
-            output_dir=_output_dir,
-            output_name=_output_name,
-            image_paths=list(image_paths),
+        from wireviz.DataClasses import Metadata
+        from wireviz.wv_watch import (
+            METADATA_FORMATS,
+            only_metadata_changed,
+            wait_for_changes,
         )
 
+        built = {}  # input file: (YAML data, harness)
+
+        def rebuild(file: Path, changed: Set[Path] = frozenset()) -> None:
+            try:
+                yaml_data = yaml.safe_load(read_input(file))
+                previous = built.get(file)
+                yaml_files = {file, *map(Path, prepend)}
+                if previous and previous[0] == yaml_data and changed <= yaml_files:
+                    print("Input data unchanged")
+                    return
+                metadata_formats = [f for f in output_formats if f in METADATA_FORMATS]
+                if (
+                    previous
+                    and metadata_formats
+                    and only_metadata_changed(previous[0], yaml_data)
+                ):
+                    # the metadata is only read when writing these outputs, so the
+                    # cached diagram and BOM stay valid (see invalidate_cache())
+                    formats = ", ".join(f.upper() for f in metadata_formats)
+                    print(f"Only metadata changed, regenerating {formats} output")
+                    harness = previous[1]
+                    harness.metadata = Metadata(**yaml_data.get("metadata", {}))
+                    if "title" not in harness.metadata:
+                        harness.metadata["title"] = output_path(file).name
+                    harness.output(
+                        filename=output_path(file), fmt=tuple(metadata_formats)
+                    )
+                    if depfile:  # the HTML template may have changed
+                        write_dependencies(file, harness)
+                else:
+                    harness = build(file, yaml_data)
+                built[file] = (yaml_data, harness)
+            except Exception as error:  # keep watching, the input may be fixed
+                print(f"Error: {type(error).__name__}: {error}")
+
+        for file in filepaths:
+            rebuild(file)
+        print("Watching for changes, press Ctrl+C to stop")
+        try:
+            while True:
+                watched = {
+                    file: (
+                        set(dependencies(file, built[file][1]))
+                        if file in built
+                        else {file, *map(Path, prepend)}
+                    )
+                    for file in filepaths
+                }
+                changed = wait_for_changes(set().union(*watched.values()))
+                print()
+                if changed & set(map(Path, prepend)):
+                    prepend_input = read_prepend_files()
+                for file in filepaths:
+                    if changed & watched[file]:
+                        rebuild(file, changed)
+        except KeyboardInterrupt:
+            pass
+
+    if profile_stats:
+        profiler.dump_stats(profile_stats)
+        print("Profile stats:", profile_stats)
+
     print()
 
 
+def write_depfile(filename: Path, targets: list, dependencies: list) -> None:
+    """Write a Make/Ninja depfile declaring that all targets depend on all dependencies."""
+
+    def escape(path) -> str:
+        return str(path).replace(" ", "\\ ").replace("#", "\\#").replace("$", "$$")
+
+    lines = [" ".join(escape(target) for target in targets) + ":"]
+    lines.extend(f"  {escape(dependency)}" for dependency in dependencies)
+    file_write_text_if_changed(filename, " \\\n".join(lines) + "\n")
+
+
+@click.command(context_settings=dict(help_option_names=["-h", "--help"]))
+@click.option(
+    "--host",
+    default="127.0.0.1",
+    type=str,
+    show_default=True,
+    help="Address to listen on for HTTP requests.",
+)
+@click.option(
+    "--port",
+    default=8088,
+    type=int,
+    show_default=True,
+    help="Port to listen on for HTTP requests.",
+)
+@click.option(
+    "-s",
+    "--socket",
+    default=None,
+    type=Path,
+    help="Unix domain socket to listen on instead of a TCP port.",
+)
+@click.option(
+    "-j",
+    "--workers",
+    default=None,
+    type=int,
+    help="Maximum number of renders running in parallel (default: number of CPUs).",
+)
+@click.option(
+    "-i",
+    "--image-path",
+    default=[],
+    multiple=True,
+    type=Path,
+    help="Directory to use when resolving image paths in the input (optional, repeatable).",
+)
+@click.option(
+    "--max-size",
+    default=10,
+    type=int,
+    show_default=True,
+    help="Maximum size in MB of the YAML input of a request.",
+)
+def serve(host, port, socket, workers, image_path, max_size):
+    """
+    Keeps running and renders YAML input received by HTTP POST requests to
+    /render?format=svg|png|tsv[&preview=1].
+    Images are only read from the image paths given with -i.
+    """
+    from wireviz.wv_server import serve as serve_forever
+
+    serve_forever(host, port, socket, workers, list(image_path), max_size)
+
+
+@click.command(context_settings=dict(help_option_names=["-h", "--help"]))
+@click.option(
+    "--spool",
+    required=True,
+    type=Path,
+    help="Spool directory shared by all workers, e.g. on a network file system.",
+)
+@click.option(
+    "-f",
+    "--format",
+    default="hpst",
+    type=str,
+    show_default=True,
+    help="Output formats (see 'wireviz --help').",
+)
+@click.option(
+    "-i",
+    "--image-path",
+    default=[],
+    multiple=True,
+    type=Path,
+    help="Directory to use when resolving image paths in the input (optional, repeatable).",
+)
+@click.option(
+    "--stale-timeout",
+    default=60.0,
+    type=float,
+    show_default=True,
+    help="Seconds without heartbeat after which the jobs of a worker are requeued.",
+)
+@click.option(
+    "--max-attempts",
+    default=3,
+    type=int,
+    show_default=True,
+    help="Number of workers a job may be claimed by before it is considered failed.",
+)
+@click.option(
+    "--exit-when-empty",
+    is_flag=True,
+    default=False,
+    help="Exit when no jobs are queued or in progress, instead of waiting for new jobs.",
+)
+def worker(spool, format, image_path, stale_timeout, max_attempts, exit_when_empty):
+    """
+    Renders YAML job files claimed from the queue/ subdirectory of a spool directory,
+    writing the outputs to output/ and a status record to status/.
+    Many workers on many nodes may share the spool directory.
+    """
+    from wireviz.wv_spool import HEARTBEAT_INTERVAL, SpoolWorker
+
+    output_formats = []
+    for code in format:
+        if code in format_codes:
+            output_formats.append(format_codes[code])
+        else:
+            raise Exception(f"Unknown output format: {code}")
+
+    spool_worker = SpoolWorker(
+        spool,
+        output_formats=tuple(sorted(set(output_formats))),
+        image_paths=list(image_path),
+        heartbeat_interval=min(HEARTBEAT_INTERVAL, stale_timeout / 4),
+        stale_timeout=stale_timeout,
+        max_attempts=max_attempts,
+    )
+    print(f"{APP_NAME} {__version__} worker {spool_worker.name}")
+    try:
+        processed = spool_worker.run(exit_when_empty=exit_when_empty)
+    except KeyboardInterrupt:
+        print("Stopped, unfinished jobs were requeued")
+    else:
+        print(f"Processed {processed} job(s)")
+
+
+@click.command(
+    no_args_is_help=True,
+    context_settings=dict(help_option_names=["-h", "--help"]),
+)
+@click.argument("file", nargs=-1)
+@click.option(
+    "-p",
+    "--prepend",
+    default=[],
+    multiple=True,
+    type=Path,
+    help="YAML file to prepend to each input file (optional).",
+)
+@click.option(
+    "-o",
+    "--output",
+    default=None,
+    type=Path,
+    help="TSV file to write the merged BOM to (default: standard output).",
+)
+def bom_merge(file, prepend, output):
+    """
+    Parses all provided FILEs and writes one BOM containing the parts of all of them,
+    without generating any diagrams. Designators are prefixed by the input file name.
+    """
+    import wireviz.wireviz as wv
+    from wireviz.wv_bom import bom_list, merge_boms
+    from wireviz.wv_helper import tuplelist2tsv
+
+    prepend_input = "".join(file_read_text(p) + "\n" for p in prepend)
+    image_paths = {Path(p).parent for p in prepend}
+
+    stems = [Path(f).stem for f in file]
+
+    def harness_name(filename: Path) -> str:
+        # files of the same name in different directories are told apart by path
+        if stems.count(filename.stem) > 1:
+            return filename.with_suffix("").as_posix()
+        return filename.stem
+
+    def harness_boms():
+        # only one harness is kept in memory at a time
+        for filename in map(Path, file):
+            if not filename.exists():
+                raise Exception(f"File does not exist:\n{filename}")
+            print("Input file:", filename, file=sys.stderr)
+            # keep warnings out of the BOM written to standard output
+            with redirect_stdout(sys.stderr):
+                harness = wv.parse(
+                    prepend_input + file_read_text(filename),
+                    return_types="harness",
+                    image_paths=[filename.parent, *image_paths],
+                )
+            yield harness_name(filename), harness.bom()
+
+    tsv = tuplelist2tsv(bom_list(merge_boms(harness_boms())))
+    if output:
+        file_write_text_if_changed(output, tsv)
+        print("Merged BOM:", output, file=sys.stderr)
+    else:
+        sys.stdout.write(tsv)
+
+
+# Subcommands are selected by the first argument, anything else is parsed by wireviz()
+subcommands = {
+    "serve": serve,
+    "worker": worker,
+    "bom-merge": bom_merge,
+}
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in subcommands:
+        name = sys.argv[1]
+        subcommands[name](sys.argv[2:], prog_name=f"{CMD_NAME} {name}")
+    else:
+        wireviz()
+
+
 if __name__ == "__main__":
-    wireviz()
+    main()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from wireviz import APP_NAME, __version__
+
+# GraphViz port names used in the diagram, see Harness.create_graph()
+CONNECTOR_PORT = re.compile(r"^p(\d+)([lr])$")  # pin number (1-based index) and side
+CABLE_PORT = re.compile(r"^w(\d+|s)$")  # wire number or shield
+SIDES = {"l": "left", "r": "right", "w": "left", "e": "right"}  # port or compass
+
+Point = List[float]
+
+
+def _point(text: str) -> Point:
+    x, y = text.split(",")[:2]
+    return [float(x), float(y)]
+
+
+def _spline(pos: str) -> Tuple[List[Point], Point, Point]:
+    """Return the control points, start point and end point of a GraphViz edge pos."""
+    points, start, end = [], None, None
+    for token in pos.split():
+        if token.startswith("s,"):  # arrow tip at the tail
+            start = _point(token[2:])
+        elif token.startswith("e,"):  # arrow tip at the head
+            end = _point(token[2:])
+        else:
+            points.append(_point(token))
+    return points, start or points[0], end or points[-1]
+
+
+def _bbox(node: Dict[str, Any]) -> List[float]:
+    x, y = _point(node["pos"])
+    # width and height are given in inches
+    w, h = float(node["width"]) * 72 / 2, float(node["height"]) * 72 / 2
+    return [x - w, y - h, x + w, y + h]
+
+
+def layout_geometry(harness: "Harness", layout: bytes) -> Dict[str, Any]:
+    """
+    Return the positions of the connectors, cables, pins and wires of the harness,
+    taken from the diagram laid out by GraphViz in its json output format.
+    Coordinates are in points, with the origin at the bottom left as in GraphViz.
+    Pins and wires are located where an edge is attached to them, so pins without
+    any connection and the pins of simple connectors have no position.
+    """
+    graph = json.loads(layout)
+    geometry = {
+        "generator": f"{APP_NAME} {__version__}",
+        "units": "pt",
+        "bbox": [float(v) for v in graph["bb"].split(",")] if "bb" in graph else None,
+        "connectors": {},
+        "cables": {},
+        "edges": [],
+    }
+    nodes = {}  # _gvid: name
+    for node in graph.get("objects", []):
+        name = node.get("name")
+        if "pos" not in node:
+            continue  # a subgraph
+        nodes[node["_gvid"]] = name
+        if name in harness.connectors:
+            geometry["connectors"][name] = {"bbox": _bbox(node), "pins": {}}
+        elif name in harness.cables:
+            geometry["cables"][name] = {"bbox": _bbox(node), "wires": {}}
+
+    def attach(name: str, port: Optional[str], point: Point) -> Dict[str, Any]:
+        """Record the point of an edge end in its pin or wire, return the edge end."""
+        port, _, compass = (port or "").partition(":")
+        connector_port = CONNECTOR_PORT.match(port)
+        cable_port = CABLE_PORT.match(port)
+        if name in geometry["connectors"] and connector_port:
+            index, side = connector_port.groups()
+            pin = harness.connectors[name].pins[int(index) - 1]
+            pins = geometry["connectors"][name]["pins"]
+            pins.setdefault(str(pin), {})[SIDES[side]] = point
+            return {"connector": name, "pin": pin}
+        if name in geometry["cables"] and cable_port:
+            wire = cable_port.group(1)
+            wire = wire if wire == "s" else int(wire)
+            wires = geometry["cables"][name]["wires"]
+            wires.setdefault(str(wire), {})[SIDES.get(compass, "left")] = point
+            return {"cable": name, "wire": wire}
+        kind = "cable" if name in harness.cables else "connector"
+        return {kind: name}
+
+    for edge in graph.get("edges", []):
+        if "pos" not in edge:
+            continue
+        points, start, finish = _spline(edge["pos"])
+        tail = attach(nodes.get(edge["tail"]), edge.get("tailport"), start)
+        head = attach(nodes.get(edge["head"]), edge.get("headport"), finish)
+        geometry["edges"].append({"from": tail, "to": head, "points": points})
+    return geometry
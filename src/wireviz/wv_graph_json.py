@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+import json
+from dataclasses import asdict
+from typing import Any, Dict, Iterator, Optional
+
+from wireviz import APP_NAME, __version__
+from wireviz.DataClasses import Cable, Connector, MateComponent
+from wireviz.wv_bom import BOM_COLUMNS_OPTIONAL
+from wireviz.wv_colors import get_color_hex
+
+# Graph JSON written for each harness, without layout (positions are left to the reader):
+# {
+#   "generator": "WireViz <version>",
+#   "title": "...",
+#   "nodes": [one object per connector or cable, with its "ports"],
+#   "edges": [one object per wire end or mate, joining "from" and "to" node ports]
+# }
+# Port ids are "p<n>" for the n-th pin of a connector, "w<n>" for the n-th wire
+# of a cable and "ws" for its shield. The wire ids match the GraphViz port names,
+# but pins have one GraphViz port per side, "p<n>l" and "p<n>r", so pin ids must
+# be mapped to these to join graph JSON with the json or xdot layout output.
+# Nodes and edges are written one per line, so large harnesses can be streamed.
+
+
+def _colors(color: Optional[str]) -> Optional[Dict[str, Any]]:
+    return {"code": color, "hex": get_color_hex(color)} if color else None
+
+
+def _part(component) -> Dict[str, Any]:
+    fields = {f: getattr(component, f) for f in BOM_COLUMNS_OPTIONAL}
+    return {f: value for f, value in fields.items() if value is not None}
+
+
+def _connector_node(connector: Connector) -> Dict[str, Any]:
+    ports = []
+    for index, pin in enumerate(connector.pins):
+        port = {"id": f"p{index + 1}", "pin": pin}
+        if index < len(connector.pinlabels) and connector.pinlabels[index] != "":
+            port["label"] = connector.pinlabels[index]
+        if index < len(connector.pincolors):
+            port["color"] = _colors(connector.pincolors[index])
+        port["connected"] = connector.visible_pins.get(pin, False)
+        ports.append(port)
+    return {
+        "id": connector.name,
+        "kind": "connector",
+        "show_name": connector.show_name,
+        "type": connector.type,
+        "subtype": connector.subtype,
+        "style": connector.style,
+        "color": _colors(connector.color),
+        "image": asdict(connector.image) if connector.image else None,
+        "notes": connector.notes,
+        "part": _part(connector),
+        "hide_disconnected_pins": connector.hide_disconnected_pins,
+        "loops": [
+            [_pin_port(connector, pin) for pin in loop] for loop in connector.loops
+        ],
+        "ports": ports,
+    }
+
+
+def _cable_node(cable: Cable) -> Dict[str, Any]:
+    ports = []
+    for index, color in enumerate(cable.colors):
+        port = {"id": f"w{index + 1}", "wire": index + 1, "color": _colors(color)}
+        if index < len(cable.wirelabels) and cable.wirelabels[index] != "":
+            port["label"] = cable.wirelabels[index]
+        ports.append(port)
+    if cable.shield:
+        shield = cable.shield if isinstance(cable.shield, str) else None
+        ports.append({"id": "ws", "wire": "s", "color": _colors(shield)})
+    return {
+        "id": cable.name,
+        "kind": "bundle" if cable.category == "bundle" else "cable",
+        "show_name": cable.show_name,
+        "type": cable.type,
+        "wirecount": cable.wirecount,
+        "gauge": f"{cable.gauge} {cable.gauge_unit}" if cable.gauge else None,
+        "length": cable.length,
+        "length_unit": cable.length_unit,
+        "color_code": cable.color_code,
+        "color": _colors(cable.color),
+        "image": asdict(cable.image) if cable.image else None,
+        "notes": cable.notes,
+        "part": _part(cable),
+        "ports": ports,
+    }
+
+
+def _pin_port(connector: Connector, pin) -> str:
+    return f"p{connector.pins.index(pin) + 1}"
+
+
+def graph_nodes(harness: "Harness") -> Iterator[Dict[str, Any]]:
+    """Yield a node for each connector and cable in the diagram."""
+    for connector in harness.connectors.values():
+        if harness.focus is None or connector.name in harness.focus:
+            yield _connector_node(connector)
+    for cable in harness.cables.values():
+        if harness.focus is None or cable.name in harness.focus:
+            yield _cable_node(cable)
+
+
+def graph_edges(harness: "Harness") -> Iterator[Dict[str, Any]]:
+    """Yield an edge for each wire end attached to a connector, and for each mate."""
+    shown = lambda name: harness.focus is None or name in harness.focus
+    for cable in harness.cables.values():
+        if not shown(cable.name):
+            continue
+        for connection in cable.connections:
+            wire = f"w{connection.via_port}"
+            if connection.via_port == "s":
+                color = cable.shield if isinstance(cable.shield, str) else None
+            else:
+                color = cable.colors[connection.via_port - 1]
+            for name, pin, end in [
+                (connection.from_name, connection.from_pin, "from"),
+                (connection.to_name, connection.to_pin, "to"),
+            ]:
+                if pin is None or not shown(name):
+                    continue
+                port = _pin_port(harness.connectors[name], pin)
+                ends = [(name, port), (cable.name, wire)]
+                (from_name, from_port), (to_name, to_port) = (
+                    ends if end == "from" else ends[::-1]
+                )
+                yield {
+                    "kind": "wire",
+                    "from": from_name,
+                    "from_port": from_port,
+                    "to": to_name,
+                    "to_port": to_port,
+                    "cable": cable.name,
+                    "wire": connection.via_port,
+                    "color": _colors(color),
+                }
+    for mate in harness.mates:
+        if not (shown(mate.from_name) and shown(mate.to_name)):
+            continue
+        edge = {"kind": "mate", "from": mate.from_name, "to": mate.to_name}
+        if not isinstance(mate, MateComponent):
+            edge["from_port"] = _pin_port(
+                harness.connectors[mate.from_name], mate.from_pin
+            )
+            edge["to_port"] = _pin_port(harness.connectors[mate.to_name], mate.to_pin)
+        edge["arrow"] = mate.shape
+        yield edge
+
+
+def graph_json_chunks(harness: "Harness") -> Iterator[str]:
+    """Yield the graph JSON of the harness in pieces, to be joined or written one by one."""
+    dumps = lambda obj: json.dumps(obj, ensure_ascii=False, default=str)
+    yield "{\n"
+    yield f'"generator": {dumps(f"{APP_NAME} {__version__}")},\n'
+    yield f'"title": {dumps(harness.metadata.get("title"))},\n'
+    for section, items in [
+        ("nodes", graph_nodes(harness)),
+        ("edges", graph_edges(harness)),
+    ]:
+        yield f'"{section}": ['
+        separator = "\n"
+        for item in items:
+            yield separator + dumps(item)
+            separator = ",\n"
+        yield "\n]" + (",\n" if section == "nodes" else "\n")
+    yield "}\n"
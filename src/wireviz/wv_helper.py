@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 
+import os
 import re
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List
 
@@ -133,11 +135,55 @@ def file_read_text(filename: str) -> str:
     return Path(filename).read_text(encoding="utf-8")
 
 
+def file_read_text_cached(filename: str) -> str:
+    """Read utf-8 encoded text file like file_read_text(), cached until the file changes"""
+    stat = Path(filename).stat()
+    return _file_read_text_cached(str(filename), stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=32)
+def _file_read_text_cached(filename, mtime_ns, size):
+    return file_read_text(filename)
+
+
 def file_write_text(filename: str, text: str) -> int:
     """Write utf-8 encoded text file, close it, and return the number of characters written"""
     return Path(filename).write_text(text, encoding="utf-8")
 
 
+def file_write_bytes_if_changed(filename: str, data: bytes) -> bool:
+    """
+    Write data to file unless it already contains exactly this data,
+    keeping its modification time stable for build tools. Return True if written.
+    """
+    path = Path(filename)
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+    path.write_bytes(data)
+    return True
+
+
+def file_write_text_if_changed(filename: str, text: str) -> bool:
+    """Write utf-8 encoded text file like file_write_text(), unless it is unchanged"""
+    # translate newlines like file_write_text() does
+    return file_write_bytes_if_changed(
+        filename, text.replace("\n", os.linesep).encode("utf-8")
+    )
+
+
+def file_replace_if_changed(source: str, target: str) -> bool:
+    """Move source file to target, unless target has the same contents (then delete source)"""
+    source, target = Path(source), Path(target)
+    if target.is_file() and target.read_bytes() == source.read_bytes():
+        source.unlink()
+        return False
+    source.replace(target)
+    return True
+
+
 def is_arrow(inp):
     """
     Matches strings of one or multiple `-` or `=` (but not mixed)
@@ -154,6 +200,17 @@ def is_arrow(inp):
 
 
 def aspect_ratio(image_src):
+    try:
+        stat = Path(image_src).stat()
+    except Exception as error:
+        print(f"aspect_ratio(): {type(error).__name__}: {error}")
+        return 1  # Assume 1:1 when unable to read actual image size
+    # cached until the image file changes
+    return _aspect_ratio(str(image_src), stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=128)
+def _aspect_ratio(image_src, mtime_ns, size):
     try:
         from PIL import Image
 
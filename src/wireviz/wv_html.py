@@ -10,12 +10,26 @@ from wireviz.svgembed import data_URI_base64
 from wireviz.wv_gv_html import html_line_breaks
 from wireviz.wv_helper import (
     file_read_text,
-    file_write_text,
+    file_read_text_cached,
+    file_write_text_if_changed,
     flatten2d,
     smart_file_resolve,
 )
 
 
+def html_template_file(filename: Union[str, Path], metadata: Metadata) -> Path:
+    """Return the HTML template file used for the HTML output filename."""
+    templatename = metadata.get("template", {}).get("name")
+    if templatename:
+        # if relative path to template was provided, check directory of YAML file first, fall back to built-in template directory
+        return smart_file_resolve(
+            f"{templatename}.html",
+            [Path(filename).parent, Path(__file__).parent / "templates"],
+        )
+    # fall back to built-in simple template if no template was provided
+    return Path(__file__).parent / "templates/simple.html"
+
+
 def generate_html_output(
     filename: Union[str, Path],
     bom_list: List[List[str]],
@@ -23,18 +37,10 @@ def generate_html_output(
     options: Options,
 ):
     # load HTML template
-    templatename = metadata.get("template", {}).get("name")
-    if templatename:
-        # if relative path to template was provided, check directory of YAML file first, fall back to built-in template directory
-        templatefile = smart_file_resolve(
-            f"{templatename}.html",
-            [Path(filename).parent, Path(__file__).parent / "templates"],
-        )
-    else:
-        # fall back to built-in simple template if no template was provided
-        templatefile = Path(__file__).parent / "templates/simple.html"
+    templatefile = html_template_file(filename, metadata)
 
-    html = file_read_text(templatefile)  # TODO?: Warn if unexpected meta charset?
+    # TODO?: Warn if unexpected meta charset?
+    html = file_read_text_cached(templatefile)
 
     # embed SVG diagram (only if used)
     def svgdata() -> str:
@@ -127,4 +133,4 @@ def generate_html_output(
     pattern = re.compile("|".join(replacements_escaped))
     html = pattern.sub(lambda match: replacements[match.group(0)], html)
 
-    file_write_text(f"{filename}.html", html)
+    file_write_text_if_changed(f"{filename}.html", html)
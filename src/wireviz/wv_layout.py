@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import weakref
+from contextvars import copy_context
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Dict, List, Optional, Tuple
+
+from wireviz.wv_timing import measuring_memory, record_child_rss
+
+# Graphviz attributes trading layout fidelity for speed, applied on top of
+# the graph attributes set by Harness.create_graph()
+LAYOUT_PROFILES = {
+    # Graphviz defaults, i.e. the best layout dot can find
+    "quality": {},
+    # fewer network simplex and crossing minimization iterations
+    "balanced": {
+        "nslimit": "2",
+        "nslimit1": "2",
+        "mclimit": "0.5",
+        "searchsize": "30",
+    },
+    # minimal iterations and straight edges, intended for draft builds
+    "fast": {
+        "nslimit": "0.2",
+        "nslimit1": "0.2",
+        "mclimit": "0.05",
+        "searchsize": "10",
+        "remincross": "false",
+        "splines": "line",
+    },
+}
+LAYOUT_ENGINES = ("dot", "neato", "fdp", "sfdp", "circo", "twopi", "osage")
+# Lays out simple chains without GraphViz (see wv_native_layout), falling back to dot
+NATIVE_ENGINE = "native"
+
+# Cheaper configurations to retry with, in this order, when a layout exceeds
+# its time or memory limit: (description, graph attributes, simple connectors)
+LAYOUT_FALLBACKS = [
+    (
+        "splines=polyline and reduced crossing minimization",
+        {"splines": "polyline", "mclimit": "0.1"},
+        False,
+    ),
+    ("layout profile 'fast'", LAYOUT_PROFILES["fast"], False),
+    (
+        "layout profile 'fast' and connectors with style: simple",
+        LAYOUT_PROFILES["fast"],
+        True,
+    ),
+]
+
+# Graphviz tool used to combine separately laid out graphs into one
+PACK_TOOL = "gvpack"
+# Engine used to render packed graphs, keeping the existing node positions
+PACK_RENDER_CMD = ["neato", "-n2"]
+
+
+# Graphviz verbose (-v) messages reporting the duration of a layout step, e.g.
+# "network simplex: 12 nodes 15 edges 3 iter 0.00 sec" or "mincross G: 0 crossings, 0.01 secs."
+STATISTICS_STEP = re.compile(
+    r"^(network simplex|mincross|routesplines|gvRenderJobs)\b.*?(\d+\.\d+) secs?\.?$"
+)
+# any other verbose message ending with a duration
+STATISTICS_OTHER = re.compile(r"^([^:]+):.*?(\d+\.\d+) secs?\.?$")
+# Graphviz verbose messages starting a layout phase, e.g. "Starting phase 1 [dot_rank]"
+STATISTICS_PHASE = re.compile(r"^Starting phase \d+ \[(\w+)\]")
+_statistics_lock = threading.Lock()  # packed layouts share one statistics dict
+
+
+# maximum number of Graphviz processes started by the async functions at any time
+async_concurrency = os.cpu_count() or 4
+_async_semaphores = weakref.WeakKeyDictionary()  # one semaphore per event loop
+
+
+class LayoutLimitExceeded(Exception):
+    """Raised when a Graphviz process is killed for exceeding its time or memory limit."""
+
+
+def _limit_memory(cmd: List[str], memory_limit: Optional[int]) -> List[str]:
+    """Return the command run with its address space limited to memory_limit MB."""
+    if memory_limit:
+        if os.name == "posix":
+            if shutil.which(cmd[0]) is None:
+                raise _not_found(cmd)  # would be reported by the shell otherwise
+            # set by the shell replaced by the command, as preexec_fn is not safe
+            # while other threads (e.g. of packed layouts) are running
+            limit = str(memory_limit * 1024)  # in KB
+            return ["sh", "-c", 'ulimit -v "$0" && exec "$@"', limit, *cmd]
+        print(f"Warning: The layout memory limit is not supported on {os.name}")
+    return cmd
+
+
+def _check_result(
+    cmd: List[str],
+    returncode: int,
+    stderr: bytes,
+    memory_limit: Optional[int],
+) -> None:
+    """Raise an exception if a Graphviz process failed."""
+    if returncode != 0:
+        stderr = stderr.decode("utf-8", errors="replace")
+        if memory_limit and os.name == "posix":
+            if returncode < 0 or "memory" in stderr.lower():
+                # killed by a signal or failed to allocate memory
+                raise LayoutLimitExceeded(
+                    f"{cmd[0]} exceeded the memory limit of {memory_limit} MB"
+                )
+        raise Exception(
+            f"{' '.join(cmd)} failed with exit code {returncode}:\n" + stderr
+        )
+
+
+def _statistics_cmd(
+    cmd: List[str], statistics: Optional[Dict[str, float]]
+) -> List[str]:
+    """Return the command with verbose output enabled if statistics are collected."""
+    return [cmd[0], "-v", *cmd[1:]] if statistics is not None else cmd
+
+
+def parse_statistics(stderr: bytes, statistics: Dict[str, float]) -> None:
+    """
+    Add the duration of each layout step reported in the verbose Graphviz output
+    to statistics, keyed by step (prefixed by its phase, if reported).
+    """
+    phase = None
+    steps = {}
+    for line in stderr.decode("utf-8", errors="replace").splitlines():
+        line = line.strip()
+        match = STATISTICS_PHASE.match(line)
+        if match:
+            phase = match.group(1)
+            continue
+        match = STATISTICS_STEP.match(line) or STATISTICS_OTHER.match(line)
+        if match:
+            step = match.group(1).strip()
+            step = f"{phase}/{step}" if phase else step
+            steps[step] = steps.get(step, 0.0) + float(match.group(2))
+    with _statistics_lock:
+        for step, seconds in steps.items():
+            statistics[step] = statistics.get(step, 0.0) + seconds
+
+
+def _not_found(cmd: List[str]) -> Exception:
+    return Exception(
+        f"{cmd[0]} was not found. Please make sure GraphViz is installed and on the PATH."
+    )
+
+
+def _run_recording_rss(
+    cmd: List[str],
+    data: bytes,
+    timeout: Optional[float],
+) -> Tuple[int, bytes, bytes]:
+    """
+    Same as subprocess.run(), but reaping the process with os.wait4()
+    to record its peak resident set size (POSIX only).
+    """
+    outputs = {}
+    with subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    ) as process:
+
+        def feed() -> None:
+            for write in (lambda: process.stdin.write(data), process.stdin.close):
+                try:
+                    write()
+                except BrokenPipeError:  # the process has exited early
+                    pass
+
+        def read(name: str) -> None:
+            outputs[name] = getattr(process, name).read()
+
+        threads = [threading.Thread(target=feed, daemon=True)] + [
+            threading.Thread(target=read, args=(name,), daemon=True)
+            for name in ("stdout", "stderr")
+        ]
+        for thread in threads:
+            thread.start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in threads:
+            thread.join(
+                None if deadline is None else max(0, deadline - time.monotonic())
+            )
+        timed_out = any(thread.is_alive() for thread in threads)
+        if timed_out:
+            process.kill()
+        _, status, rusage = os.wait4(process.pid, 0)
+        for thread in threads:  # finish reading and writing before closing the pipes
+            thread.join()
+        # setting returncode keeps Popen from waiting for the reaped process again
+        if os.WIFSIGNALED(status):
+            process.returncode = -os.WTERMSIG(status)
+        else:
+            process.returncode = os.WEXITSTATUS(status)
+    if timed_out:
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    # ru_maxrss is in bytes on macOS, and in kilobytes elsewhere
+    record_child_rss(rusage.ru_maxrss * (1 if sys.platform == "darwin" else 1024))
+    return process.returncode, outputs["stdout"], outputs["stderr"]
+
+
+def run_graphviz(
+    cmd: List[str],
+    data: bytes,
+    timeout: Optional[float] = None,
+    memory_limit: Optional[int] = None,
+    statistics: Optional[Dict[str, float]] = None,
+) -> bytes:
+    """
+    Run a Graphviz command with data as stdin and return its stdout.
+
+    The process is killed and LayoutLimitExceeded is raised if it runs for more than
+    timeout seconds, or if it fails while its memory is limited to memory_limit MB
+    (the memory limit is only supported on POSIX systems).
+    If a statistics dict is passed, Graphviz is run in verbose mode, and the duration
+    of each layout step is added to it (see parse_statistics()).
+    """
+    cmd = _statistics_cmd(cmd, statistics)
+    limited_cmd = _limit_memory(cmd, memory_limit)
+    try:
+        if measuring_memory() and hasattr(os, "wait4"):
+            returncode, stdout, stderr = _run_recording_rss(limited_cmd, data, timeout)
+        else:
+            result = subprocess.run(
+                limited_cmd,
+                input=data,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=timeout,
+            )
+            returncode, stdout, stderr = result.returncode, result.stdout, result.stderr
+    except FileNotFoundError:
+        raise _not_found(cmd)
+    except subprocess.TimeoutExpired:  # the process has been killed
+        raise LayoutLimitExceeded(f"{cmd[0]} exceeded the time limit of {timeout} s")
+    _check_result(cmd, returncode, stderr, memory_limit)
+    if statistics is not None:
+        parse_statistics(stderr, statistics)
+    return stdout
+
+
+def set_async_concurrency(limit: int) -> None:
+    """Set the maximum number of Graphviz processes started by the async functions."""
+    global async_concurrency
+    async_concurrency = limit
+    _async_semaphores.clear()
+
+
+def _async_semaphore() -> "asyncio.Semaphore":
+    import asyncio
+
+    loop = asyncio.get_event_loop()
+    if loop not in _async_semaphores:
+        _async_semaphores[loop] = asyncio.Semaphore(async_concurrency)
+    return _async_semaphores[loop]
+
+
+async def run_graphviz_async(
+    cmd: List[str],
+    data: bytes,
+    timeout: Optional[float] = None,
+    memory_limit: Optional[int] = None,
+    statistics: Optional[Dict[str, float]] = None,
+) -> bytes:
+    """Same as run_graphviz(), but without blocking the event loop."""
+    import asyncio  # deferred, only needed by the async API
+
+    cmd = _statistics_cmd(cmd, statistics)
+    async with _async_semaphore():
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *_limit_memory(cmd, memory_limit),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except FileNotFoundError:
+            raise _not_found(cmd)
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(data), timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise LayoutLimitExceeded(
+                f"{cmd[0]} exceeded the time limit of {timeout} s"
+            )
+    _check_result(cmd, process.returncode, stderr, memory_limit)
+    if statistics is not None:
+        parse_statistics(stderr, statistics)
+    return stdout
+
+
+def _output_args(formats: List[str], directory: str) -> List[str]:
+    """Return Graphviz arguments writing one output file per format into directory."""
+    return [
+        arg
+        for fmt in formats
+        for arg in (f"-T{fmt}", "-o" + str(Path(directory) / f"graph.{fmt}"))
+    ]
+
+
+def _read_outputs(formats: List[str], directory: str) -> Dict[str, bytes]:
+    return {fmt: (Path(directory) / f"graph.{fmt}").read_bytes() for fmt in formats}
+
+
+def _render(
+    cmd: List[str], data: bytes, formats: List[str], **limits
+) -> Dict[str, bytes]:
+    """Run a Graphviz command rendering the result of one layout in all formats."""
+    if len(formats) == 1:
+        return {formats[0]: run_graphviz(cmd + [f"-T{formats[0]}"], data, **limits)}
+    with TemporaryDirectory() as directory:
+        run_graphviz(cmd + _output_args(formats, directory), data, **limits)
+        return _read_outputs(formats, directory)
+
+
+async def _render_async(
+    cmd: List[str], data: bytes, formats: List[str], **limits
+) -> Dict[str, bytes]:
+    """Same as _render(), but without blocking the event loop."""
+    if len(formats) == 1:
+        output = await run_graphviz_async(cmd + [f"-T{formats[0]}"], data, **limits)
+        return {formats[0]: output}
+    with TemporaryDirectory() as directory:
+        await run_graphviz_async(cmd + _output_args(formats, directory), data, **limits)
+        return _read_outputs(formats, directory)
+
+
+def pipe(source: str, fmt: str, engine: str = "dot", **limits) -> bytes:
+    """Return the graph source laid out and rendered in the given format."""
+    return run_graphviz([engine, f"-T{fmt}"], source.encode("utf-8"), **limits)
+
+
+async def pipe_async(source: str, fmt: str, engine: str = "dot", **limits) -> bytes:
+    """Same as pipe(), but without blocking the event loop."""
+    return await run_graphviz_async(
+        [engine, f"-T{fmt}"], source.encode("utf-8"), **limits
+    )
+
+
+def pipe_formats(
+    source: str, formats: List[str], engine: str = "dot", **limits
+) -> Dict[str, bytes]:
+    """Return the graph source laid out once and rendered in each of the given formats."""
+    return _render([engine], source.encode("utf-8"), formats, **limits)
+
+
+async def pipe_formats_async(
+    source: str, formats: List[str], engine: str = "dot", **limits
+) -> Dict[str, bytes]:
+    """Same as pipe_formats(), but without blocking the event loop."""
+    return await _render_async([engine], source.encode("utf-8"), formats, **limits)
+
+
+def can_pack() -> bool:
+    """Return True if the Graphviz tools needed by pipe_packed() are available."""
+    return all(shutil.which(cmd) for cmd in (PACK_TOOL, PACK_RENDER_CMD[0]))
+
+
+def pipe_packed(
+    sources: List[str],
+    formats: List[str],
+    engine: str = "dot",
+    max_workers: Optional[int] = None,
+    **limits,
+) -> Dict[str, bytes]:
+    """
+    Lay out each graph source in its own Graphviz process in parallel,
+    pack the results into one graph, and return it rendered in each of the given formats.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    # run each layout in a copy of the current context to keep reporting its spans
+    contexts = [copy_context() for _ in sources]
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        # each worker thread just waits for its own Graphviz subprocess
+        layouts = list(
+            executor.map(
+                lambda context, src: context.run(pipe, src, "dot", engine, **limits),
+                contexts,
+                sources,
+            )
+        )
+    packed = run_graphviz([PACK_TOOL], b"\n".join(layouts))
+    return _render(PACK_RENDER_CMD, packed, formats, **limits)
+
+
+async def pipe_packed_async(
+    sources: List[str], formats: List[str], engine: str = "dot", **limits
+) -> Dict[str, bytes]:
+    """Same as pipe_packed(), but without blocking the event loop."""
+    import asyncio
+
+    layouts = await asyncio.gather(
+        *(pipe_async(src, "dot", engine, **limits) for src in sources)
+    )
+    packed = await run_graphviz_async([PACK_TOOL], b"\n".join(layouts))
+    return await _render_async(PACK_RENDER_CMD, packed, formats, **limits)
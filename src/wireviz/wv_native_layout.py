@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+
+from html import escape
+from typing import Dict, List, Optional, Tuple
+
+from wireviz import APP_NAME, APP_URL, __version__
+from wireviz.DataClasses import Cable, Connector, MateComponent
+from wireviz.wv_colors import get_color_hex, translate_color
+from wireviz.wv_gv_html import remove_links
+
+# Lays out harnesses whose connectors and cables form chains from left to right,
+# like the connection sets they are defined by, without running GraphViz:
+# each component is placed in the column given by its position in the chains,
+# and every wire or mate must join neighboring columns. Anything else is left
+# to GraphViz (see native_layout_problem()).
+
+FONT_SIZE = 14
+CHAR_WIDTH = 8  # estimated average character width at FONT_SIZE
+ROW_HEIGHT = 22
+PADDING = 6  # inside node boxes
+COLUMN_GAP = 120  # between the columns, room for the wires
+NODE_GAP = 30  # between the nodes of a column
+MARGIN = 12
+
+
+def _shown(harness: "Harness", name: Optional[str]) -> bool:
+    return name is not None and (harness.focus is None or name in harness.focus)
+
+
+def _links(harness: "Harness") -> List[Tuple[str, str]]:
+    """Return (left, right) designator pairs of all wires and mates in the diagram."""
+    links = {}  # ordered set
+    for cable in harness.cables.values():
+        if not _shown(harness, cable.name):
+            continue
+        for connection in cable.connections:
+            if _shown(harness, connection.from_name):
+                links[(connection.from_name, cable.name)] = None
+            if _shown(harness, connection.to_name):
+                links[(cable.name, connection.to_name)] = None
+    for mate in harness.mates:
+        if _shown(harness, mate.from_name) and _shown(harness, mate.to_name):
+            links[(mate.from_name, mate.to_name)] = None
+    return list(links)
+
+
+def _columns(harness: "Harness") -> Optional[Dict[str, int]]:
+    """Return the column of each component, None if the links contain a cycle."""
+    names = [
+        name for name in [*harness.connectors, *harness.cables] if _shown(harness, name)
+    ]
+    right_of = {name: [] for name in names}
+    lefts = {name: 0 for name in names}
+    for left, right in _links(harness):
+        right_of[left].append(right)
+        lefts[right] += 1
+    # longest path from the left, in topological order (Kahn's algorithm)
+    columns = {name: 0 for name in names}
+    ready = [name for name in names if lefts[name] == 0]
+    done = 0
+    while ready:
+        name = ready.pop()
+        done += 1
+        for right in right_of[name]:
+            columns[right] = max(columns[right], columns[name] + 1)
+            lefts[right] -= 1
+            if lefts[right] == 0:
+                ready.append(right)
+    return columns if done == len(names) else None
+
+
+def native_layout_problem(harness: "Harness") -> Optional[str]:
+    """Return why the harness cannot be laid out natively, None if it can."""
+    if harness.tweak.override or harness.tweak.append:
+        return "tweak is used"
+    components = [*harness.connectors.values(), *harness.cables.values()]
+    for component in components:
+        if component.image:
+            return f"{component.name} has an image"
+    for connector in harness.connectors.values():
+        if connector.loops:
+            return f"{connector.name} has loops"
+    for name, component in [*harness.connectors.items(), *harness.cables.items()]:
+        if _shown(harness, name) and not _node(component, harness).rows:
+            return f"{name} has no rows to show"
+    columns = _columns(harness)
+    if columns is None:
+        return "the connections contain a cycle"
+    for left, right in _links(harness):
+        if columns[right] != columns[left] + 1:
+            return f"{left} and {right} are not in neighboring columns"
+    return None
+
+
+class _Node:
+    """A connector or cable box: text rows, and the rows its ports are attached to."""
+
+    def __init__(self, name: str, simple: bool, grid: bool):
+        self.name = name
+        self.simple = simple
+        self.grid = grid  # draw lines between the rows
+        # (text, wire color) per row, the color is None for rows without wire
+        self.rows: List[Tuple[str, Optional[str]]] = []
+        self.ports: Dict[str, int] = {}  # port: row index
+        self.x = self.y = 0.0
+
+    def add(self, text: str, port: Optional[str] = None, wire: str = None) -> None:
+        if port:
+            self.ports[port] = len(self.rows)
+        self.rows.append((text, wire))
+
+    @property
+    def width(self) -> float:
+        longest = max((len(text) for text, _ in self.rows), default=0)
+        return max(longest * CHAR_WIDTH + 2 * PADDING, 60)
+
+    @property
+    def height(self) -> float:
+        return len(self.rows) * ROW_HEIGHT
+
+    def port_y(self, port: Optional[str]) -> float:
+        if self.simple or port not in self.ports:
+            return self.y + self.height / 2
+        return self.y + (self.ports[port] + 0.5) * ROW_HEIGHT
+
+
+def _text(value) -> str:
+    return remove_links(str(value)).replace("\n", " ") if value is not None else ""
+
+
+def _parts(component) -> List[str]:
+    parts = [
+        f"{label}: {_text(value)}"
+        for label, value in [
+            ("P/N", component.pn),
+            (component.manufacturer or "MPN", component.mpn),
+            (component.supplier or "SPN", component.spn),
+        ]
+        if value and not isinstance(value, list)
+    ]
+    return [", ".join(parts)] if parts else []
+
+
+def _connector_node(connector: Connector, harness: "Harness") -> _Node:
+    simple = harness.options.preview or connector.style == "simple"
+    node = _Node(connector.name, simple, grid=True)
+    if simple:  # like GraphViz, show the type instead of a hidden name
+        node.add(_text(connector.name if connector.show_name else connector.type))
+        return node
+    if connector.show_name:
+        node.add(_text(connector.name))
+    info = [_text(connector.type), _text(connector.subtype)]
+    info.append(f"{connector.pincount}-pin" if connector.show_pincount else "")
+    if connector.color:
+        info.append(translate_color(connector.color, harness.options.color_mode))
+    if any(info):
+        node.add(", ".join(i for i in info if i))
+    for line in _parts(connector):
+        node.add(line)
+    for index, pin in enumerate(connector.pins):
+        if connector.hide_disconnected_pins and not connector.visible_pins.get(pin):
+            continue
+        label = connector.pinlabels[index] if index < len(connector.pinlabels) else ""
+        node.add(f"{pin}  {_text(label)}".strip(), port=f"p{index + 1}")
+    for part in connector.additional_components:
+        node.add(f"{part.qty} x {_text(part.description)}")
+    if connector.notes:
+        node.add(_text(connector.notes))
+    return node
+
+
+def _cable_node(cable: Cable, harness: "Harness") -> _Node:
+    node = _Node(cable.name, harness.options.preview, grid=False)
+    if node.simple:  # preview, like GraphViz
+        node.add(_text(cable.name if cable.show_name else cable.type))
+        return node
+    if cable.show_name:
+        node.add(_text(cable.name))
+    info = [_text(cable.type)]
+    if cable.show_wirecount:
+        gauge = f" x {cable.gauge} {cable.gauge_unit}" if cable.gauge else ""
+        info.append(f"{cable.wirecount}{gauge}")
+    if cable.shield:
+        info.append("+ S")
+    if cable.length > 0:
+        info.append(f"{cable.length} {cable.length_unit}")
+    if cable.color:
+        info.append(translate_color(cable.color, harness.options.color_mode))
+    if any(info):
+        node.add(", ".join(i for i in info if i))
+    for line in _parts(cable):
+        node.add(line)
+    for index, color in enumerate(cable.colors):
+        label = [str(index + 1)] if cable.show_wirenumbers else []
+        if color:
+            label.append(translate_color(color, harness.options.color_mode))
+        if index < len(cable.wirelabels) and cable.wirelabels[index]:
+            label.append(_text(cable.wirelabels[index]))
+        node.add(":".join(label))
+        node.add("", port=f"w{index + 1}", wire=color or "")
+    if cable.shield:
+        node.add("Shield")
+        shield = cable.shield if isinstance(cable.shield, str) else ""
+        node.add("", port="ws", wire=shield)
+    for part in cable.additional_components:
+        node.add(f"{part.qty} x {_text(part.description)}")
+    if cable.notes:
+        node.add(_text(cable.notes))
+    return node
+
+
+def _node(component, harness: "Harness") -> _Node:
+    if isinstance(component, Connector):
+        return _connector_node(component, harness)
+    return _cable_node(component, harness)
+
+
+def _order(columns: Dict[str, int], links: List[Tuple[str, str]]) -> List[List[str]]:
+    """Return the designators of each column, ordered to reduce crossing wires."""
+    ordered = [[] for _ in range(max(columns.values(), default=-1) + 1)]
+    for name, column in columns.items():  # connectors first, in order of creation
+        ordered[column].append(name)
+    lefts = {name: [] for name in columns}
+    for left, right in links:
+        lefts[right].append(left)
+    for column in range(1, len(ordered)):
+        # place each component near the middle of its left neighbors
+        position = {name: i for i, name in enumerate(ordered[column - 1])}
+        ordered[column].sort(
+            key=lambda name: (
+                sum(position[n] for n in lefts[name]) / len(lefts[name])
+                if lefts[name]
+                else len(position)
+            )
+        )
+    return ordered
+
+
+def _wire_path(x1: float, y1: float, x2: float, y2: float) -> str:
+    dx = (x2 - x1) / 2
+    return (
+        f"M{x1:.1f},{y1:.1f} "
+        f"C{x1 + dx:.1f},{y1:.1f} {x2 - dx:.1f},{y2:.1f} {x2:.1f},{y2:.1f}"
+    )
+
+
+def _wire(path: str, color: Optional[str]) -> List[str]:
+    """Return SVG elements drawing a wire like GraphViz: colors with black borders."""
+    colors = get_color_hex(color) if color else ["#000000"]
+    stroke = f'd="{path}" fill="none" stroke-width'
+    svg = [f'<path {stroke}="5" stroke="#000000"/>']
+    svg.append(f'<path {stroke}="3" stroke="{colors[0]}"/>')
+    for index, stripe in enumerate(colors[1:], 1):  # multicolored wires
+        dash = f'stroke-dasharray="8,{8 * (len(colors) - 1)}"'
+        offset = f'stroke-dashoffset="{-8 * index}"'
+        svg.append(f'<path {stroke}="3" stroke="{stripe}" {dash} {offset}/>')
+    return svg
+
+
+def render_native_svg(harness: "Harness") -> bytes:
+    """Return the diagram laid out in columns and drawn as SVG, without GraphViz."""
+    options = harness.options
+    columns = _columns(harness)
+    links = _links(harness)
+    nodes = {
+        name: _node(component, harness)
+        for name, component in [*harness.connectors.items(), *harness.cables.items()]
+        if _shown(harness, name)
+    }
+
+    # positions: columns from left to right, nodes of each column centered vertically
+    ordered = _order(columns, links)
+    heights = [
+        sum(nodes[n].height for n in names) + NODE_GAP * (len(names) - 1)
+        for names in ordered
+    ]
+    total_height = max(heights, default=0)
+    x = MARGIN
+    for names, height in zip(ordered, heights):
+        y = MARGIN + (total_height - height) / 2
+        width = max(nodes[n].width for n in names)
+        for name in names:
+            nodes[name].x = x + (width - nodes[name].width) / 2
+            nodes[name].y = y
+            y += nodes[name].height + NODE_GAP
+        x += width + COLUMN_GAP
+    width = x - COLUMN_GAP + MARGIN if ordered else 2 * MARGIN
+    height = total_height + 2 * MARGIN
+
+    def bgcolor(color, default: str) -> str:
+        return translate_color(color, "HEX") if color else default
+
+    svg = [
+        '<?xml version="1.0" encoding="UTF-8" standalone="no"?>',
+        f"<!-- Generated by {APP_NAME} {__version__} native layout - {APP_URL} -->",
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.0f}pt" '
+        f'height="{height:.0f}pt" viewBox="0 0 {width:.1f} {height:.1f}" '
+        f'font-family="{escape(options.fontname)}" font-size="{FONT_SIZE}">',
+    ]
+    svg.append(
+        f'<rect width="100%" height="100%" fill="{bgcolor(options.bgcolor, "#FFF")}"/>'
+    )
+
+    # wires and mates, below the nodes
+    edges = {}  # ordered set, to draw each wire or mate once
+    for cable in harness.cables.values():
+        if cable.name not in nodes:
+            continue
+        for connection in cable.connections:
+            if connection.via_port == "s":
+                color = cable.shield if isinstance(cable.shield, str) else None
+            else:
+                color = cable.colors[connection.via_port - 1] or None
+            wire = f"w{connection.via_port}"
+            for name, pin, left in [
+                (connection.from_name, connection.from_pin, True),
+                (connection.to_name, connection.to_pin, False),
+            ]:
+                if name not in nodes:
+                    continue
+                port = f"p{harness.connectors[name].pins.index(pin) + 1}"
+                ends = [(name, port), (cable.name, wire)]
+                key = tuple(ends if left else ends[::-1])
+                if options.preview:  # one edge per pair of joined components
+                    key = (key[0][0], None), (key[1][0], None)
+                    color = None
+                edges[key] = color
+    for ((left, left_port), (right, right_port)), color in edges.items():
+        a, b = nodes[left], nodes[right]
+        path = _wire_path(a.x + a.width, a.port_y(left_port), b.x, b.port_y(right_port))
+        svg.append(f'<g class="edge"><title>{escape(left)}--{escape(right)}</title>')
+        svg.extend(_wire(path, color))
+        svg.append("</g>")
+    for mate in harness.mates:
+        if mate.from_name not in nodes or mate.to_name not in nodes:
+            continue
+        a, b = nodes[mate.from_name], nodes[mate.to_name]
+        if isinstance(mate, MateComponent) or options.preview:
+            ports = (None, None)
+        else:
+            ports = (
+                f"p{harness.connectors[mate.from_name].pins.index(mate.from_pin) + 1}",
+                f"p{harness.connectors[mate.to_name].pins.index(mate.to_pin) + 1}",
+            )
+        path = _wire_path(a.x + a.width, a.port_y(ports[0]), b.x, b.port_y(ports[1]))
+        width = 3 if isinstance(mate, MateComponent) else 1.5
+        svg.append(
+            f'<g class="edge"><title>{escape(mate.from_name)}--{escape(mate.to_name)}'
+            f'</title><path d="{path}" fill="none" stroke="#000000" '
+            f'stroke-width="{width}" stroke-dasharray="6,4"/></g>'
+        )
+
+    # nodes
+    for name, node in nodes.items():
+        component = harness.connectors.get(name) or harness.cables[name]
+        bundle = name in harness.cables and component.category == "bundle"
+        if name in harness.connectors:
+            default = options.bgcolor_connector
+        else:
+            default = options.bgcolor_bundle if bundle else options.bgcolor_cable
+        fill = bgcolor(component.bgcolor, bgcolor(default, "#FFFFFF"))
+        dash = ' stroke-dasharray="6,3"' if bundle else ""
+        svg.append(f'<g class="node" id="{escape(name)}"><title>{escape(name)}</title>')
+        svg.append(
+            f'<rect x="{node.x:.1f}" y="{node.y:.1f}" width="{node.width:.1f}" '
+            f'height="{node.height:.1f}" fill="{fill}" stroke="#000000"{dash}/>'
+        )
+        for index, (text, wire) in enumerate(node.rows):
+            top = node.y + index * ROW_HEIGHT
+            right = node.x + node.width
+            if index and node.grid:
+                svg.append(
+                    f'<line x1="{node.x:.1f}" y1="{top:.1f}" x2="{right:.1f}" '
+                    f'y2="{top:.1f}" stroke="#000000" stroke-width="0.5"/>'
+                )
+            if wire is not None:  # the wire runs through the cable
+                middle = top + ROW_HEIGHT / 2
+                svg.extend(_wire(f"M{node.x:.1f},{middle:.1f} H{right:.1f}", wire))
+            if text:
+                svg.append(
+                    f'<text x="{node.x + node.width / 2:.1f}" '
+                    f'y="{top + ROW_HEIGHT - 7:.1f}" text-anchor="middle">'
+                    f"{escape(text)}</text>"
+                )
+        svg.append("</g>")
+    svg.append("</svg>")
+    return ("\n".join(svg) + "\n").encode("utf-8")
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+import re
+import socketserver
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlparse
+
+import wireviz.wireviz as wv
+from wireviz import APP_NAME, __version__
+from wireviz.wv_bom import bom_list
+from wireviz.wv_helper import tuplelist2tsv
+
+content_types = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+    "tsv": "text/tab-separated-values; charset=utf-8",
+}
+
+RenderKey = Tuple[str, str, bool]  # (hash of YAML input, format, preview)
+
+MAX_REQUEST_SIZE = 10  # MB of YAML input accepted per request
+LOOPBACK_HOSTS = ("127.0.0.1", "::1", "localhost")
+# image files read by GraphViz, from component images or HTML in any text field
+GV_IMAGE_SRC = re.compile(r'<img\b[^>]*\bsrc="([^"]*)"', re.IGNORECASE)
+
+
+class RenderServer:
+    """
+    Render YAML input on a bounded pool of worker threads.
+    Identical requests arriving while a render is in flight share its result.
+    Images are only read from the given image directories, and tweak is rejected,
+    so clients cannot have files of the server embedded into their output.
+    """
+
+    def __init__(
+        self, max_workers: Optional[int] = None, image_paths: List[Path] = None
+    ):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or os.cpu_count())
+        self.image_paths = [Path(path).resolve() for path in image_paths or []]
+        self.in_flight: Dict[RenderKey, Future] = {}
+        self.lock = threading.RLock()  # done callbacks may run while it is held
+
+    def render(self, yaml_input: bytes, fmt: str, preview: bool = False) -> bytes:
+        """Return the YAML input rendered in the given format (png, svg or tsv)."""
+        if fmt not in content_types:
+            raise ValueError(f"Unknown output format: {fmt}")
+        key = (hashlib.sha256(yaml_input).hexdigest(), fmt, preview)
+        with self.lock:
+            future = self.in_flight.get(key)
+            if future is None:
+                future = self.executor.submit(self._render, yaml_input, fmt, preview)
+                self.in_flight[key] = future
+                future.add_done_callback(lambda _: self._forget(key))
+        return future.result()
+
+    def _forget(self, key: RenderKey) -> None:
+        with self.lock:
+            self.in_flight.pop(key, None)
+
+    def _render(self, yaml_input: bytes, fmt: str, preview: bool) -> bytes:
+        import yaml
+
+        # parsed here, as wv.parse() would read a file if given a path as input
+        yaml_data = yaml.safe_load(yaml_input.decode("utf-8"))
+        if not isinstance(yaml_data, dict):
+            raise ValueError("Expected a dict as top-level YAML input")
+        self._check_input(yaml_data)
+        harness = wv.parse(
+            yaml_data,
+            return_types="harness",
+            image_paths=self.image_paths,
+            preview=preview,
+        )
+        for src in GV_IMAGE_SRC.findall(harness.graph.source):
+            if not self._in_image_paths(Path(src)):
+                raise ValueError(f"Image {src} is not in an image path of the server")
+        if fmt == "png":
+            return harness.png
+        if fmt == "svg":
+            return harness.svg.encode("utf-8")
+        return tuplelist2tsv(bom_list(harness.bom())).encode("utf-8")
+
+    def _in_image_paths(self, path: Path) -> bool:
+        path = path.resolve()
+        return any(path == d or d in path.parents for d in self.image_paths)
+
+    def _check_input(self, yaml_data: Dict) -> None:
+        """Raise ValueError if the input would make the server read arbitrary files."""
+        if yaml_data.get("tweak"):
+            raise ValueError("tweak is not accepted by the server")
+        for section in ("connectors", "cables"):
+            components = yaml_data.get(section)
+            for name, attribs in (components or {}).items():
+                image = attribs.get("image") if isinstance(attribs, dict) else None
+                if not isinstance(image, dict) or not image.get("src"):
+                    continue
+                src = Path(image["src"])
+                # any of the image paths may be used to resolve a relative path
+                paths = (
+                    [src] if src.is_absolute() else [d / src for d in self.image_paths]
+                )
+                if not paths or not all(self._in_image_paths(p) for p in paths):
+                    raise ValueError(
+                        f"{section}.{name}: Image {src} is not in an image path "
+                        "of the server"
+                    )
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=True)
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /render?format=svg|png|tsv[&preview=1] with the YAML input as request body.
+    GET / returns the application name and version.
+    Bodies larger than server.max_request_size MB are rejected with 413.
+    """
+
+    server_version = f"{APP_NAME}/{__version__}"
+
+    def do_GET(self) -> None:
+        self._respond(200, f"{APP_NAME} {__version__}\n".encode("utf-8"), "text/plain")
+
+    def do_POST(self) -> None:
+        url = urlparse(self.path)
+        if url.path != "/render":
+            self._respond(404, b"Not found\n", "text/plain")
+            return
+        query = parse_qs(url.query)
+        fmt = query.get("format", ["svg"])[0].lower()
+        preview = query.get("preview", ["0"])[0].lower() in ("1", "true", "yes")
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._respond(400, b"Invalid Content-Length\n", "text/plain")
+            return
+        if length > self.server.max_request_size * 1024 * 1024:
+            self.close_connection = True  # the body is not read
+            self._respond(413, b"Request body too large\n", "text/plain")
+            return
+        yaml_input = self.rfile.read(length)
+        try:
+            data = self.server.renderer.render(yaml_input, fmt, preview)
+        except Exception as error:
+            message = f"{type(error).__name__}: {error}\n".encode("utf-8")
+            self._respond(400, message, "text/plain; charset=utf-8")
+            return
+        self._respond(200, data, content_types[fmt])
+
+    def _respond(self, status: int, data: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self) -> str:
+        # client_address is an empty string for Unix domain sockets
+        return self.client_address[0] if self.client_address else "local"
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8088,
+    socket_path: Union[None, str, Path] = None,
+    max_workers: Optional[int] = None,
+    image_paths: List[Path] = None,
+    max_request_size: int = MAX_REQUEST_SIZE,
+) -> None:
+    """
+    Serve render requests over HTTP on localhost or a Unix domain socket until
+    interrupted. Clients are trusted not to overload the server, so it should not
+    be reachable from other hosts.
+    """
+    if socket_path:
+        socket_path = Path(socket_path)
+        if socket_path.exists():
+            socket_path.unlink()  # left behind by a previous server
+        httpd = UnixHTTPServer(str(socket_path), RenderRequestHandler)
+        address = f"unix:{socket_path}"
+    else:
+        if host not in LOOPBACK_HOSTS:
+            print(f"Warning: Serving on {host}, the server is meant for local clients")
+        httpd = ThreadingHTTPServer((host, port), RenderRequestHandler)
+        address = f"http://{host}:{port}"
+    httpd.renderer = RenderServer(max_workers, image_paths)
+    httpd.max_request_size = max_request_size
+    print(f"{APP_NAME} {__version__} serving on {address}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        httpd.renderer.shutdown()
+        if socket_path:
+            socket_path.unlink()
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import wireviz.wireviz as wv
+
+# Layout of a spool directory, shared by all workers (e.g. on an NFS volume).
+# Jobs are claimed by renaming them, which is atomic within one file system:
+#   queue/<job>.yml             YAML input waiting to be rendered
+#   claimed/<worker>/<job>.yml  jobs being rendered by a worker
+#   claimed/.<id>/<job>.yml     jobs of a dead worker, being requeued
+#   done/<job>.yml              rendered jobs, outputs are in output/
+#   failed/<job>.yml            jobs that raised an error or killed too many workers
+#   output/<job>.<format>       generated output files
+#   status/<job>.json           status record of each job
+#   workers/<worker>            heartbeat file of each running worker
+SPOOL_DIRS = ["queue", "claimed", "done", "failed", "output", "status", "workers"]
+
+HEARTBEAT_INTERVAL = 10.0  # seconds between heartbeats
+STALE_TIMEOUT = 60.0  # seconds without heartbeat until a worker is considered dead
+POLL_INTERVAL = 1.0  # seconds between checks of an empty queue
+MAX_ATTEMPTS = 3  # claims of a job before it is failed instead of requeued
+
+
+def _write_atomic(filename: Path, text: str) -> None:
+    # readers on other nodes never see a partially written file
+    temp = filename.with_name(f".{filename.name}.{uuid.uuid4().hex}")
+    temp.write_text(text, encoding="utf-8")
+    os.replace(temp, filename)
+
+
+def init_spool(spool: Path) -> None:
+    """Create the subdirectories of a spool directory, if missing."""
+    for name in SPOOL_DIRS:
+        (Path(spool) / name).mkdir(parents=True, exist_ok=True)
+
+
+def submit(spool: Path, yaml_input: str, job: str) -> Path:
+    """Add a job rendering yaml_input to the queue, return the queued job file."""
+    init_spool(spool)
+    queued = Path(spool) / "queue" / f"{job}.yml"
+    _write_atomic(queued, yaml_input)
+    return queued
+
+
+def read_status(spool: Path, job: str) -> Optional[Dict[str, Any]]:
+    """Return the status record of a job, None if it has none yet."""
+    try:
+        return json.loads((Path(spool) / "status" / f"{job}.json").read_text("utf-8"))
+    except FileNotFoundError:
+        return None
+
+
+class SpoolWorker:
+    """
+    Render jobs claimed from a spool directory shared by many workers on many nodes.
+    A worker signals it is alive by touching its heartbeat file. The jobs claimed by
+    a worker without recent heartbeat are requeued by the first worker noticing it,
+    unless they have been claimed MAX_ATTEMPTS times already.
+    """
+
+    def __init__(
+        self,
+        spool: Path,
+        output_formats: Tuple[str, ...] = ("html", "png", "svg", "tsv"),
+        image_paths: List[Path] = None,
+        heartbeat_interval: float = HEARTBEAT_INTERVAL,
+        stale_timeout: float = STALE_TIMEOUT,
+        max_attempts: int = MAX_ATTEMPTS,
+    ):
+        self.spool = Path(spool)
+        self.output_formats = output_formats
+        self.image_paths = list(image_paths or [])
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_timeout = stale_timeout
+        self.max_attempts = max_attempts
+        # unique even if a dead worker on the same node had the same PID
+        self.name = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.heartbeat = self.spool / "workers" / self.name
+        self.claimed = self.spool / "claimed" / self.name
+        self.stopping = threading.Event()
+
+    def run(self, exit_when_empty: bool = False, poll: float = POLL_INTERVAL) -> int:
+        """Process jobs until stopped (or the queue is empty), return the number processed."""
+        init_spool(self.spool)
+        # the heartbeat comes first, claimed dirs without one are requeued
+        self.heartbeat.touch()
+        self.claimed.mkdir()
+        beating = threading.Thread(target=self._beat, daemon=True)
+        beating.start()
+        processed = 0
+        try:
+            while not self.stopping.is_set():
+                self.requeue_stale()
+                job_file = self.claim()
+                if job_file:
+                    self.process(job_file)
+                    processed += 1
+                elif exit_when_empty and not self._jobs_in_progress():
+                    break
+                else:
+                    self.stopping.wait(poll)
+        finally:
+            self.stopping.set()
+            beating.join()
+            if self.heartbeat.exists():  # otherwise, the jobs were requeued already
+                # hand unfinished jobs (e.g. on Ctrl+C) back to the queue
+                self._requeue_jobs(self.claimed, count_attempt=False)
+                self.claimed.rmdir()
+                self.heartbeat.unlink()
+        return processed
+
+    def stop(self) -> None:
+        self.stopping.set()
+
+    def _beat(self) -> None:
+        while not self.stopping.wait(self.heartbeat_interval):
+            try:
+                os.utime(self.heartbeat)
+            except FileNotFoundError:
+                # another worker considered this one dead and requeued its jobs
+                print("Warning: Heartbeat file was removed, stopping worker")
+                self.stop()
+
+    def claim(self) -> Optional[Path]:
+        """Move the oldest available job to this worker, return it (None if there is none)."""
+        queue = self.spool / "queue"
+        jobs = []
+        for entry in os.scandir(queue):
+            if entry.name.endswith(".yml") and not entry.name.startswith("."):
+                try:
+                    jobs.append((entry.stat().st_mtime, entry.name))
+                except FileNotFoundError:
+                    pass  # claimed by another worker in the meantime
+        for _, name in sorted(jobs):
+            try:
+                os.rename(queue / name, self.claimed / name)
+            except FileNotFoundError:
+                continue  # claimed by another worker in the meantime
+            return self.claimed / name
+        return None
+
+    def process(self, job_file: Path) -> None:
+        """Render a claimed job, write its outputs and status record."""
+        job = job_file.stem
+        status = read_status(self.spool, job) or {}
+        attempts = status.get("attempts", 0) + 1
+        self._write_status(job, "running", attempts=attempts)
+        try:
+            wv.parse(
+                job_file.read_text(encoding="utf-8"),
+                output_formats=self.output_formats,
+                output_dir=self.spool / "output",
+                output_name=job,
+                image_paths=self.image_paths,
+            )
+        except Exception as error:
+            self._write_status(
+                job,
+                "failed",
+                attempts=attempts,
+                error=f"{type(error).__name__}: {error}",
+                traceback=traceback.format_exc(),
+            )
+            self._move(job_file, "failed")
+            print(f"Failed: {job}: {type(error).__name__}: {error}")
+        else:
+            self._write_status(job, "done", attempts=attempts)
+            self._move(job_file, "done")
+            print(f"Done:   {job}")
+
+    def requeue_stale(self) -> None:
+        """
+        Requeue the jobs of all workers whose heartbeat is older than stale_timeout,
+        and the jobs left in claimed dirs without heartbeat (e.g. by a worker killed
+        while requeueing).
+        """
+        workers = self.spool / "workers"
+        try:
+            # compare with the own heartbeat, as clocks of other nodes may differ
+            now = self.heartbeat.stat().st_mtime
+        except FileNotFoundError:
+            return  # this worker was considered dead itself and is stopping
+        for entry in os.scandir(workers):
+            if entry.name.startswith(".") or entry.name == self.name:
+                continue
+            try:
+                if now - entry.stat().st_mtime < self.stale_timeout:
+                    continue
+                # only the worker winning this rename requeues the dead worker's jobs
+                reaped = workers / f".{entry.name}.reaped"
+                os.rename(entry.path, reaped)
+            except FileNotFoundError:
+                continue  # stopped meanwhile, or being requeued by another worker
+            print(f"Worker {entry.name} stopped responding, requeueing its jobs")
+            self._requeue_claimed(entry.name)
+            reaped.unlink()
+        for entry in os.scandir(self.spool / "claimed"):
+            if entry.name.startswith("."):
+                try:  # being requeued, unless left behind for stale_timeout
+                    if now - entry.stat().st_mtime < self.stale_timeout:
+                        continue
+                except FileNotFoundError:
+                    continue
+            elif (workers / entry.name).exists():
+                continue
+            self._requeue_claimed(entry.name)
+
+    def _requeue_claimed(self, name: str) -> None:
+        claimed = self.spool / "claimed" / name
+        # only the worker winning this rename requeues the jobs, and a slow worker
+        # still claiming jobs can no longer move them into the renamed dir
+        requeuing = claimed.with_name(f".{uuid.uuid4().hex}")
+        try:
+            os.rename(claimed, requeuing)
+        except FileNotFoundError:
+            return  # being requeued by another worker
+        os.utime(requeuing)  # renaming keeps the mtime, which marks left behind dirs
+        self._requeue_jobs(requeuing, count_attempt=True)
+        requeuing.rmdir()
+
+    def _requeue_jobs(self, claimed: Path, count_attempt: bool) -> None:
+        for job_file in list(claimed.iterdir()):
+            job = job_file.stem
+            status = read_status(self.spool, job) or {}
+            attempts = status.get("attempts", 0)
+            if not count_attempt:  # the job was never finished, do not count it
+                attempts = max(attempts - 1, 0)
+            if count_attempt and attempts >= self.max_attempts:
+                error = f"Worker stopped responding in {attempts} attempts"
+                self._write_status(job, "failed", attempts=attempts, error=error)
+                self._move(job_file, "failed")
+            else:
+                self._write_status(job, "queued", attempts=attempts)
+                self._move(job_file, "queue")
+
+    def _move(self, job_file: Path, spool_dir: str) -> None:
+        try:
+            os.replace(job_file, self.spool / spool_dir / job_file.name)
+        except FileNotFoundError:
+            pass  # requeued by another worker, which considered this one dead
+
+    def _jobs_in_progress(self) -> bool:
+        """Return True if any worker has claimed jobs, which may yet be requeued."""
+        for entry in os.scandir(self.claimed.parent):
+            try:
+                if any(os.scandir(entry.path)):
+                    return True
+            except FileNotFoundError:
+                pass  # the worker stopped in the meantime
+        return False
+
+    def _write_status(self, job: str, state: str, **fields) -> None:
+        record = {"job": job, "state": state, "worker": self.name, "time": time.time()}
+        record.update(fields)
+        _write_atomic(
+            self.spool / "status" / f"{job}.json", json.dumps(record, indent=2) + "\n"
+        )
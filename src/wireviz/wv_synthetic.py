@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import random
+import sys
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Union
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(Path(__file__).parent.parent))  # add src/wireviz to PATH
+
+from wireviz import APP_NAME, __version__
+from wireviz.wv_colors import COLOR_CODES
+
+# (type, subtype, manufacturer, mpn prefix) of the generated connectors
+CONNECTOR_KINDS = [
+    ("Molex KK 254", "female", "Molex", "22-01-30"),
+    ("D-Sub", "male", "Amphenol", "L717SDE"),
+    ("Phoenix MSTB", "female", "Phoenix Contact", "17578"),
+]
+GAUGES = [0.25, 0.5, 0.75, 1.0]  # mm2
+
+
+def synthetic_harness(
+    connectors: int = 10,
+    pins: int = 4,
+    wirecount: Optional[int] = None,
+    color_codes: Sequence[str] = ("DIN",),
+    bundles: float = 0.0,
+    loops: float = 0.0,
+    mates: float = 0.0,
+    images: float = 0.0,
+    image_src: Union[None, str, Path] = None,
+    additional_components: float = 0.0,
+    templates: bool = False,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Return the YAML data of a generated harness, using the same syntax as YAML input files.
+
+    Each connector after the first one is joined to a randomly chosen earlier connector,
+    either by a cable or, with probability mates, by mating the two connectors.
+    All connectors have pins pins, and all cables have wirecount wires (default: pins),
+    each using a color code randomly chosen from color_codes.
+    bundles, loops, images and additional_components are the probabilities of a cable
+    being a bundle, a connector having a loop, a component having an image (image_src,
+    which must exist), and a component having an additional component.
+    If templates is True, components are generated from templates instead of being
+    defined one by one. The same seed always generates the same harness.
+    """
+    unknown = [code for code in color_codes if code not in COLOR_CODES]
+    if unknown:
+        raise Exception(f"Unknown color code(s): {', '.join(unknown)}")
+    if images and not image_src:
+        raise Exception("An image_src is required to generate images")
+    rng = random.Random(seed)
+    wirecount = wirecount or pins
+    wires_per_joint = min(pins, wirecount)
+    pinlist = list(range(1, pins + 1))
+
+    def optional_attributes(attributes: Dict[str, Any], additional: Dict[str, Any]):
+        if rng.random() < images:
+            attributes["image"] = {"src": str(image_src), "caption": "Generated"}
+        if rng.random() < additional_components:
+            attributes["additional_components"] = [additional]
+        return attributes
+
+    def connector(kind: int) -> Dict[str, Any]:
+        kind_type, subtype, manufacturer, mpn = CONNECTOR_KINDS[kind]
+        attributes = {
+            "type": kind_type,
+            "subtype": subtype,
+            "pincount": pins,
+            "manufacturer": manufacturer,
+            "mpn": f"{mpn}{pins:02}",
+        }
+        if pins > 1 and rng.random() < loops:
+            attributes["loops"] = [rng.sample(pinlist, 2)]
+        return optional_attributes(
+            attributes,
+            {"type": "Crimp", "subtype": kind_type, "qty_multiplier": "populated"},
+        )
+
+    def cable(color_code: str, gauge: float, bundle: bool) -> Dict[str, Any]:
+        attributes = {
+            "wirecount": wirecount,
+            "color_code": color_code,
+            "gauge": f"{gauge} mm2",
+        }
+        if bundle:
+            attributes["category"] = "bundle"
+        else:
+            attributes["length"] = round(rng.uniform(0.1, 2.0), 1)
+            attributes["mpn"] = f"CBL-{color_code}-{wirecount}x{gauge}"
+        return optional_attributes(
+            attributes,
+            {"type": "Sleeve", "qty_multiplier": "length", "unit": "m"},
+        )
+
+    data = {"connectors": {}, "cables": {}, "connections": []}
+
+    def connector_ref(i: int, kinds: Dict[int, int]) -> str:
+        if templates:  # one template per connector kind
+            template = f"X_{kinds[i]}"
+            if template not in data["connectors"]:
+                data["connectors"][template] = connector(kinds[i])
+            return f"{template}.X{i}"
+        if f"X{i}" not in data["connectors"]:
+            data["connectors"][f"X{i}"] = connector(kinds[i])
+        return f"X{i}"
+
+    kinds = {i: rng.randrange(len(CONNECTOR_KINDS)) for i in range(1, connectors + 1)}
+    if connectors == 1:
+        data["connections"].append([connector_ref(1, kinds)])
+    for i in range(2, connectors + 1):
+        j = rng.randrange(1, i)  # join to an earlier connector
+        pins_j = sorted(rng.sample(pinlist, wires_per_joint))
+        pins_i = sorted(rng.sample(pinlist, wires_per_joint))
+        if rng.random() < mates:
+            connection_set = [
+                {connector_ref(j, kinds): pins_j},
+                "==>",
+                {connector_ref(i, kinds): pins_i},
+            ]
+        else:
+            color_code = rng.choice(color_codes)
+            gauge = rng.choice(GAUGES)
+            bundle = rng.random() < bundles
+            wires = list(range(1, wires_per_joint + 1))
+            if templates:  # one template per cable configuration
+                # the template separator must not appear in the template name
+                template = f"W_{color_code}_{GAUGES.index(gauge)}"
+                template += "_bundle" if bundle else ""
+                if template not in data["cables"]:
+                    data["cables"][template] = cable(color_code, gauge, bundle)
+                cable_ref = f"{template}.W{i}"
+            else:
+                data["cables"][f"W{i}"] = cable(color_code, gauge, bundle)
+                cable_ref = f"W{i}"
+            connection_set = [
+                {connector_ref(j, kinds): pins_j},
+                {cable_ref: wires},
+                {connector_ref(i, kinds): pins_i},
+            ]
+        data["connections"].append(connection_set)
+    return data
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description=f"{APP_NAME} Synthetic Harness Generator",
+    )
+    parser.add_argument(
+        "-V",
+        "--version",
+        action="version",
+        version=f"%(prog)s - {APP_NAME} {__version__}",
+    )
+    parser.add_argument(
+        "-n", "--connectors", type=int, default=10, help="number of connectors"
+    )
+    parser.add_argument(
+        "-p", "--pins", type=int, default=4, help="number of pins per connector"
+    )
+    parser.add_argument(
+        "-w",
+        "--wirecount",
+        type=int,
+        default=None,
+        help="number of wires per cable (default: number of pins)",
+    )
+    parser.add_argument(
+        "-c",
+        "--color-codes",
+        nargs="+",
+        choices=COLOR_CODES.keys(),
+        default=["DIN"],
+        help="color codes to choose from for each cable (default: DIN)",
+    )
+    for name, description in [
+        ("bundles", "probability of a cable being a bundle"),
+        ("loops", "probability of a connector having a loop"),
+        ("mates", "probability of joining two connectors by mating"),
+        ("images", "probability of a component having an image (requires --image)"),
+        ("additional-components", "probability of a component having one"),
+    ]:
+        parser.add_argument(f"--{name}", type=float, default=0.0, help=description)
+    parser.add_argument(
+        "--image", type=Path, default=None, help="image file used for all images"
+    )
+    parser.add_argument(
+        "-t",
+        "--templates",
+        action="store_true",
+        help="generate components from templates instead of named instances",
+    )
+    parser.add_argument("-s", "--seed", type=int, default=0, help="random seed")
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        default=None,
+        help="YAML file to write (default: standard output)",
+    )
+    return parser.parse_args()
+
+
+def main():
+    import yaml
+
+    args = parse_args()
+    data = synthetic_harness(
+        connectors=args.connectors,
+        pins=args.pins,
+        wirecount=args.wirecount,
+        color_codes=args.color_codes,
+        bundles=args.bundles,
+        loops=args.loops,
+        mates=args.mates,
+        images=args.images,
+        image_src=args.image.resolve() if args.image else None,
+        additional_components=args.additional_components,
+        templates=args.templates,
+        seed=args.seed,
+    )
+    text = yaml.safe_dump(data, sort_keys=False, allow_unicode=True)
+    if args.output:
+        args.output.write_text(text, encoding="utf-8")
+    else:
+        sys.stdout.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# called with the name of each finished span (nested span names are joined by "/",
+# e.g. "output/layout") and its duration in seconds
+SpanListener = Callable[[str, float], None]
+
+# listeners and open spans are tracked per context, so concurrent parse() calls
+# in other threads or asyncio tasks are reported to their own listeners only
+_listeners: ContextVar = ContextVar("wireviz_span_listeners", default=())
+_memory_listeners: ContextVar = ContextVar("wireviz_memory_listeners", default=())
+_open_spans: ContextVar = ContextVar("wireviz_open_spans", default=())
+
+
+@dataclass
+class MemoryUsage:
+    """Memory usage during a span, in bytes."""
+
+    peak: int  # peak memory allocated by Python (traced by tracemalloc)
+    allocated: int  # memory allocated at the end of the span minus at its start
+    child_peak_rss: Optional[int] = None  # peak RSS of the largest GraphViz process
+
+
+# called with the name of each finished span and its memory usage
+MemoryListener = Callable[[str, MemoryUsage], None]
+
+
+class _OpenSpan:
+    def __init__(self, name: str, memory: Optional[int] = None):
+        self.name = name
+        self.start_memory = memory
+        self.peak = memory
+        self.child_peak_rss = None
+
+
+def _max(a: Optional[int], b: Optional[int]) -> Optional[int]:
+    return b if a is None else a if b is None else max(a, b)
+
+
+def _start_memory(open_spans: Tuple[_OpenSpan, ...]) -> int:
+    current, peak = tracemalloc.get_traced_memory()
+    if hasattr(tracemalloc, "reset_peak"):  # Python 3.9+
+        # the peak is reset to measure this span only, so hand it to the open spans first
+        for open_span in open_spans:
+            open_span.peak = _max(open_span.peak, peak)
+        tracemalloc.reset_peak()
+    # otherwise, peaks include everything since tracemalloc was started
+    return current
+
+
+def _end_memory(open_span: _OpenSpan) -> MemoryUsage:
+    current, peak = tracemalloc.get_traced_memory()
+    return MemoryUsage(
+        peak=_max(open_span.peak, peak),
+        allocated=current - open_span.start_memory,
+        child_peak_rss=open_span.child_peak_rss,
+    )
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time the enclosed block and report it to the listeners of the current context."""
+    listeners = _listeners.get()
+    memory_listeners = _memory_listeners.get()
+    if not listeners and not memory_listeners:  # keep the overhead minimal
+        yield
+        return
+    outer_spans = _open_spans.get()
+    tracing = memory_listeners and tracemalloc.is_tracing()
+    open_span = _OpenSpan(name, _start_memory(outer_spans) if tracing else None)
+    token = _open_spans.set(outer_spans + (open_span,))
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = perf_counter() - start
+        _open_spans.reset(token)
+        path = "/".join([s.name for s in outer_spans] + [name])
+        for listener in listeners:
+            listener(path, elapsed)
+        if tracing:
+            usage = _end_memory(open_span)
+            if outer_spans:
+                outer = outer_spans[-1]
+                outer.child_peak_rss = _max(outer.child_peak_rss, usage.child_peak_rss)
+            for listener in memory_listeners:
+                listener(path, usage)
+
+
+def record_span(name: str, seconds: float) -> None:
+    """Report a span timed elsewhere (e.g. by GraphViz) as nested in the innermost open span."""
+    listeners = _listeners.get()
+    if listeners:
+        path = "/".join([s.name for s in _open_spans.get()] + [name])
+        for listener in listeners:
+            listener(path, seconds)
+
+
+def measuring_time() -> bool:
+    """Return True if spans are being timed in the current context."""
+    return bool(_listeners.get())
+
+
+def measuring_memory() -> bool:
+    """Return True if memory usage is being reported in the current context."""
+    return bool(_memory_listeners.get())
+
+
+def record_child_rss(rss: int) -> None:
+    """Record the peak RSS in bytes of a finished child process in the innermost open span."""
+    open_spans = _open_spans.get()
+    if open_spans:
+        open_spans[-1].child_peak_rss = _max(open_spans[-1].child_peak_rss, rss)
+
+
+@contextmanager
+def span_listener(listener: SpanListener) -> Iterator[SpanListener]:
+    """Report all spans finished within the enclosed block to listener."""
+    token = _listeners.set(_listeners.get() + (listener,))
+    try:
+        yield listener
+    finally:
+        _listeners.reset(token)
+
+
+@contextmanager
+def memory_listener(listener: MemoryListener) -> Iterator[MemoryListener]:
+    """
+    Report the memory usage of all spans finished within the enclosed block to listener.
+    tracemalloc is started for the block if it is not running already. As tracemalloc
+    traces the whole process, concurrent parse() calls include each other's allocations.
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    token = _memory_listeners.set(_memory_listeners.get() + (listener,))
+    try:
+        yield listener
+    finally:
+        _memory_listeners.reset(token)
+        if started:
+            tracemalloc.stop()
+
+
+def _add_parents(totals: Dict[str, object], name: str, default: Callable) -> None:
+    # make sure enclosing spans are listed before the spans they contain
+    parts = name.split("/")
+    for i in range(1, len(parts)):
+        totals.setdefault("/".join(parts[:i]), default())
+
+
+def _indented(name: str) -> str:
+    *parents, label = name.split("/")
+    return "  " * len(parents) + label
+
+
+class Timings:
+    """Span listener accumulating the total duration and count of each span."""
+
+    def __init__(self):
+        self.totals: Dict[str, List] = {}  # span name: [seconds, count]
+
+    def __call__(self, name: str, seconds: float) -> None:
+        _add_parents(self.totals, name, lambda: [0.0, 0])
+        total = self.totals.setdefault(name, [0.0, 0])
+        total[0] += seconds
+        total[1] += 1
+
+    def items(self) -> List[Tuple[str, float, int]]:
+        """
+        Return (span name, total seconds, count) for each span. The count is 0 for
+        spans that were not timed themselves, but only enclose timed spans.
+        """
+        return [
+            (name, seconds, count) for name, (seconds, count) in self.totals.items()
+        ]
+
+    def report(self) -> str:
+        """
+        Return the timings as an indented table, one line per span. Spans that were not
+        timed themselves (e.g. the GraphViz phases, of which only the steps are timed)
+        are listed as headings without a duration.
+        """
+        lines = []
+        for name, seconds, count in self.items():
+            if not count:
+                lines.append(_indented(name))
+                continue
+            times = f" ({count}x)" if count > 1 else ""
+            lines.append(f"{_indented(name):<24} {seconds * 1000:9.1f} ms{times}")
+        return "\n".join(lines)
+
+
+class MemoryReport:
+    """Memory listener keeping the highest memory usage of each span."""
+
+    def __init__(self):
+        self.usages: Dict[str, Optional[MemoryUsage]] = {}
+
+    def __call__(self, name: str, usage: MemoryUsage) -> None:
+        _add_parents(self.usages, name, lambda: None)
+        previous = self.usages.get(name)
+        if previous is not None:
+            usage = MemoryUsage(
+                peak=max(previous.peak, usage.peak),
+                allocated=max(previous.allocated, usage.allocated),
+                child_peak_rss=_max(previous.child_peak_rss, usage.child_peak_rss),
+            )
+        self.usages[name] = usage
+
+    def items(self) -> List[Tuple[str, MemoryUsage]]:
+        """Return (span name, memory usage) for each span."""
+        return [(name, usage) for name, usage in self.usages.items() if usage]
+
+    def report(self) -> str:
+        """Return the memory usage as an indented table in MB, one line per span."""
+        lines = [f"{'':<24} {'peak':>9}    {'allocated':>9}    {'GraphViz RSS':>12}"]
+        for name, usage in self.items():
+            rss = usage.child_peak_rss
+            rss = f"{rss / 2**20:9.1f} MB" if rss is not None else ""
+            lines.append(
+                f"{_indented(name):<24} {usage.peak / 2**20:9.1f} MB "
+                f"{usage.allocated / 2**20:+9.1f} MB {rss:>15}".rstrip()
+            )
+        return "\n".join(lines)
+
+
+@contextmanager
+def collect_timings() -> Iterator[Timings]:
+    """Collect the timings of all spans finished within the enclosed block."""
+    with span_listener(Timings()) as timings:
+        yield timings
+
+
+@contextmanager
+def collect_memory() -> Iterator[MemoryReport]:
+    """Collect the memory usage of all spans finished within the enclosed block."""
+    with memory_listener(MemoryReport()) as report:
+        yield report
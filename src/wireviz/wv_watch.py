@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+# seconds between checks for changed files
+POLL_INTERVAL = 0.5
+# seconds without further changes before a burst of changes is handled
+DEBOUNCE_DELAY = 0.3
+
+FileState = Optional[Tuple[int, int]]  # (mtime_ns, size), None if the file is missing
+
+
+def snapshot(files: Iterable[Path]) -> Dict[Path, FileState]:
+    """Return the modification time and size of each file."""
+    states = {}
+    for filename in files:
+        try:
+            stat = Path(filename).stat()
+            states[filename] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            states[filename] = None
+    return states
+
+
+def wait_for_changes(
+    files: Iterable[Path],
+    interval: float = POLL_INTERVAL,
+    debounce: float = DEBOUNCE_DELAY,
+) -> Set[Path]:
+    """
+    Poll the files until some of them change, and return the changed files
+    as soon as none of them has changed for debounce seconds.
+    """
+    files = list(files)
+    before = snapshot(files)
+    changed = set()
+    while not changed:
+        time.sleep(interval)
+        current = snapshot(files)
+        changed = {f for f in files if current[f] != before[f]}
+    while True:  # wait for the end of a burst of changes, e.g. while saving
+        time.sleep(debounce)
+        later = snapshot(files)
+        if later == current:
+            return changed
+        changed |= {f for f in files if later[f] != current[f]}
+        current = later
+
+
+# output formats generated from the metadata, all others can be kept when only it changes
+METADATA_FORMATS = ("html", "graphjson")
+
+
+def only_metadata_changed(previous: Dict[str, Any], current: Dict[str, Any]) -> bool:
+    """Return True if the YAML data differs in the metadata section only."""
+    if not isinstance(previous, dict) or not isinstance(current, dict):
+        return False
+    without_metadata = lambda data: {k: v for k, v in data.items() if k != "metadata"}
+    return previous.get("metadata") != current.get("metadata") and without_metadata(
+        previous
+    ) == without_metadata(current)
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+import wireviz.wireviz as wv
+
+ROOT = Path(__file__).parent.parent
+INPUTS = sorted([*ROOT.glob("examples/*.yml"), *ROOT.glob("tutorial/*.yml")])
+
+# the fake dot is run through its shebang line
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="needs a POSIX shell")
+
+ROUNDS = 20
+THREADS = 32
+
+# stands in for GraphViz, rendering each format as a digest of the graph source
+FAKE_DOT = """\
+import hashlib, sys
+digest = hashlib.sha256(sys.stdin.buffer.read()).hexdigest()
+fmt = None
+outputs = []
+for arg in sys.argv[1:]:
+    if arg.startswith("-T"):
+        fmt = arg[2:]
+    elif arg.startswith("-o"):
+        outputs.append((fmt, arg[2:]))
+if not outputs:
+    sys.stdout.write(f"<svg><!-- {fmt} {digest} --></svg>")
+for fmt, filename in outputs:
+    with open(filename, "w") as file:
+        file.write(f"<svg><!-- {fmt} {digest} --></svg>")
+"""
+
+
+@pytest.fixture(scope="module", autouse=True)
+def fake_dot(tmp_path_factory):
+    """Put the fake dot alone on the PATH, so the same is run with or without GraphViz."""
+    bin_dir = tmp_path_factory.mktemp("bin")
+    dot = bin_dir / "dot"
+    dot.write_text(f"#!{sys.executable}\n{FAKE_DOT}", "utf-8")
+    dot.chmod(0o755)
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("PATH", str(bin_dir))
+        yield
+
+
+def parse_result(yaml_file: Path):
+    """Return the GraphViz source, BOM, and rendered outputs of a harness."""
+    harness = wv.parse(yaml_file, return_types="harness")
+    rendered = harness.render(["png", "svg"])
+    return harness.graph.source, harness.bom(), rendered, harness.svg
+
+
+@pytest.fixture(scope="module")
+def serial_results():
+    return {yaml_file: parse_result(yaml_file) for yaml_file in INPUTS}
+
+
+def test_inputs_found():
+    assert INPUTS
+
+
+def test_outputs_rendered(serial_results):
+    for _, _, rendered, svg in serial_results.values():
+        assert rendered["png"].startswith(b"<svg><!-- png ")
+        assert rendered["svg"].startswith(b"<svg><!-- svg ")
+        assert svg == rendered["svg"].decode("utf-8")
+
+
+def test_parse_concurrently(serial_results):
+    jobs = INPUTS * ROUNDS
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        results = list(pool.map(parse_result, jobs))
+    for yaml_file, result in zip(jobs, results):
+        assert result == serial_results[yaml_file], yaml_file
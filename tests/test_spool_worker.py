@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from wireviz import wv_spool
+
+ROOT = Path(__file__).parent.parent
+JOBS = 12
+WORKERS = 3
+
+FAILING_INPUT = """
+connectors:
+  X1:
+    pincount: 2
+connections:
+  - [X1: [1], W1: [1], X2: [1]]
+"""
+
+
+def run_workers(spool: Path, *options: str) -> None:
+    command = [sys.executable, "-m", "wireviz.wv_cli", "worker", "--spool", str(spool)]
+    command += ["-f", "t", "--exit-when-empty", *options]
+    workers = [
+        subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        for _ in range(WORKERS)
+    ]
+    for worker in workers:
+        output, _ = worker.communicate(timeout=120)
+        assert worker.returncode == 0, output.decode()
+
+
+def jobs_in(spool: Path, spool_dir: str):
+    return sorted(p.stem for p in (spool / spool_dir).iterdir())
+
+
+def claim_by_dead_worker(spool: Path, job: str, attempts: int) -> None:
+    """Leave a job claimed by a worker whose heartbeat stopped an hour ago."""
+    wv_spool.submit(spool, (ROOT / "examples" / "ex01.yml").read_text("utf-8"), job)
+    claimed = spool / "claimed" / "dead-worker"
+    claimed.mkdir(exist_ok=True)
+    os.rename(spool / "queue" / f"{job}.yml", claimed / f"{job}.yml")
+    record = {"job": job, "state": "running", "attempts": attempts}
+    (spool / "status" / f"{job}.json").write_text(json.dumps(record), "utf-8")
+    heartbeat = spool / "workers" / "dead-worker"
+    heartbeat.touch()
+    past = time.time() - 3600
+    os.utime(heartbeat, (past, past))
+
+
+def test_workers_process_each_job_once(tmp_path):
+    # jobs are parsed from text, so their images could not be found
+    inputs = [
+        yaml_file.read_text("utf-8")
+        for yaml_file in sorted((ROOT / "examples").glob("*.yml"))
+        if "image:" not in yaml_file.read_text("utf-8")
+    ]
+    jobs = [f"job{i:02}" for i in range(JOBS)]
+    for index, job in enumerate(jobs):
+        wv_spool.submit(tmp_path, inputs[index % len(inputs)], job)
+    wv_spool.submit(tmp_path, FAILING_INPUT, "broken")
+
+    run_workers(tmp_path)
+
+    assert jobs_in(tmp_path, "done") == jobs
+    assert jobs_in(tmp_path, "failed") == ["broken"]
+    assert jobs_in(tmp_path, "queue") == []
+    assert jobs_in(tmp_path, "claimed") == []
+    assert jobs_in(tmp_path, "workers") == []
+    for job in jobs:
+        status = wv_spool.read_status(tmp_path, job)
+        assert status["state"] == "done"
+        assert status["attempts"] == 1
+        assert (tmp_path / "output" / f"{job}.bom.tsv").exists()
+    status = wv_spool.read_status(tmp_path, "broken")
+    assert status["state"] == "failed"
+    assert "W1" in status["error"]
+
+
+def test_stale_worker_jobs_are_requeued_or_failed(tmp_path):
+    claim_by_dead_worker(tmp_path, "retried", attempts=1)
+    claim_by_dead_worker(tmp_path, "exhausted", attempts=2)
+
+    run_workers(tmp_path, "--max-attempts", "2")
+
+    assert jobs_in(tmp_path, "done") == ["retried"]
+    assert jobs_in(tmp_path, "failed") == ["exhausted"]
+    assert jobs_in(tmp_path, "claimed") == []
+    status = wv_spool.read_status(tmp_path, "retried")
+    assert status["state"] == "done"
+    assert status["attempts"] == 2
+    status = wv_spool.read_status(tmp_path, "exhausted")
+    assert status["state"] == "failed"
+    assert "stopped responding" in status["error"]
+
+
+def test_claimed_jobs_without_heartbeat_are_requeued(tmp_path):
+    # left behind by a worker whose heartbeat was reaped while it was still claiming
+    claim_by_dead_worker(tmp_path, "orphaned", attempts=1)
+    os.rename(tmp_path / "claimed" / "dead-worker", tmp_path / "claimed" / "reaped")
+    (tmp_path / "workers" / "dead-worker").unlink()
+    # left behind by a worker killed while requeueing the jobs of a dead worker
+    claim_by_dead_worker(tmp_path, "interrupted", attempts=1)
+    requeuing = tmp_path / "claimed" / ".requeuing"
+    os.rename(tmp_path / "claimed" / "dead-worker", requeuing)
+    (tmp_path / "workers" / "dead-worker").unlink()
+    past = time.time() - 3600
+    os.utime(requeuing, (past, past))
+
+    run_workers(tmp_path)
+
+    assert jobs_in(tmp_path, "done") == ["interrupted", "orphaned"]
+    assert jobs_in(tmp_path, "claimed") == []
+    for job in ["interrupted", "orphaned"]:
+        assert wv_spool.read_status(tmp_path, job)["attempts"] == 2